@@ -18,7 +18,6 @@ class DataBuilder(BaseDataBuilder):
         random_seed = None
         if hasattr(self.config.data_builder, 'random_seed'):
             random_seed = self.config.data_builder.random_seed
-        num_workers = self.config.data_builder.num_workers
         # Creating data indices for training and validation splits:
         dataset_size = len(self.dataset)
         indices = list(range(dataset_size))
@@ -36,10 +35,10 @@ class DataBuilder(BaseDataBuilder):
         train_loader = torch.utils.data.DataLoader(self.dataset,
                                                    batch_size=batch_size,
                                                    sampler=train_sampler,
-                                                   num_workers=num_workers)
+                                                   **self.loader_options())
         validation_loader = torch.utils.data.DataLoader(self.dataset,
                                                         batch_size=batch_size,
                                                         sampler=valid_sampler,
-                                                        num_workers=num_workers)
+                                                        **self.loader_options())
 
-        return train_loader, validation_loader
+        return self.prefetch(train_loader), self.prefetch(validation_loader)
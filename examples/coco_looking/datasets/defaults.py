@@ -27,6 +27,8 @@ class LookingDataset(BaseDataset):
         for k, v in looking_dict.items():
             self.target.append((k, v))
         self.target = pd.DataFrame(self.target)
+        if self.config.dataset.get('shared_memory', False):
+            self.enable_shared_memory(os.path.abspath(json_file))
 
     def __len__(self):
         return len(self.target)
@@ -37,15 +39,26 @@ class LookingDataset(BaseDataset):
             idx = idx.tolist()
         img_name = self.target.iloc[idx, 0]
 
-        if img_name not in self.data:
-            # if lazy loading then load image
-            file = os.path.join(self.root_dir, img_name)
-            image = Image.open(file)
-            # copy as a PIL Image issue workaround
-            self.data[img_name] = image.copy()
-            image.close()
-
-        data = self.data[img_name]
+        file = os.path.join(self.root_dir, img_name)
+        if self.shared_data is not None:
+            # decoded pixels are shared with the other processes of the host, the image is only created per
+            # access since PIL copies RGB arrays into private memory
+            data = Image.fromarray(self.load_shared(img_name, lambda: self.decode(file)))
+        else:
+            if img_name not in self.data:
+                # if lazy loading then load image
+                image = Image.open(file)
+                # copy as a PIL Image issue workaround
+                self.data[img_name] = image.copy()
+                image.close()
+            data = self.data[img_name]
         if self.transform:
             data = self.transform(data)
         return data, np.array([self.target.iloc[idx, 1]]).astype(np.float32)
+
+    @staticmethod
+    def decode(file: str) -> np.ndarray:
+        with Image.open(file) as image:
+            if image.mode not in ('L', 'RGB', 'RGBA'):
+                image = image.convert('RGB')
+            return np.asarray(image)
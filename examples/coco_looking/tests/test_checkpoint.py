@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import torch
+
+from lighter.checkpoint import AsyncCheckpointer, CheckpointManager, ShardedCheckpoint, save_checkpoint, \
+    save_sharded_checkpoint, load_checkpoint, snapshot
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.model = torch.nn.Linear(4, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_save_checkpoint(self):
+        file = os.path.join(self.path, 'e-0.ckpt')
+        save_checkpoint({'epoch': 0, 'model_state_dict': self.model.state_dict()}, file)
+        self.assertEqual(os.listdir(self.path), ['e-0.ckpt'])
+        self.assertEqual(torch.load(file)['epoch'], 0)
+
+    def test_async_checkpointer(self):
+        checkpointer = AsyncCheckpointer()
+        expected = snapshot(self.model.state_dict())
+        file = os.path.join(self.path, 'e-1.ckpt')
+        checkpointer.submit({'epoch': 1, 'model_state_dict': self.model.state_dict()}, file)
+        # modifications after the submit must not change the saved snapshot
+        with torch.no_grad():
+            self.model.weight.add_(1.0)
+        checkpointer.wait()
+        state = torch.load(file)['model_state_dict']
+        self.assertTrue(torch.equal(state['weight'], expected['weight']))
+
+    def test_sharded_checkpoint(self):
+        optimizer = torch.optim.Adam(self.model.parameters())
+        self.model(torch.rand(3, 4)).sum().backward()
+        optimizer.step()
+        file = os.path.join(self.path, 'e-2.ckpt')
+        save_sharded_checkpoint({'epoch': 2,
+                                 'model_state_dict': self.model.state_dict(),
+                                 'optimizer_state_dict': optimizer.state_dict(),
+                                 'metrics': {'$eval$_acc': 0.5}}, file)
+        ckpt = ShardedCheckpoint(file)
+        self.assertEqual(ckpt.metadata, {'epoch': 2, 'metrics': {'$eval$_acc': 0.5}})
+        self.assertTrue(torch.equal(ckpt.tensor('model_state_dict', 'weight'), self.model.weight))
+        self.assertEqual(list(ckpt.load_shard('model_state_dict', prefix='bias').keys()), ['bias'])
+        state = load_checkpoint(file)
+        model = torch.nn.Linear(4, 2)
+        model.load_state_dict(state['model_state_dict'])
+        self.assertTrue(torch.equal(model.weight, self.model.weight))
+        torch.optim.Adam(model.parameters()).load_state_dict(state['optimizer_state_dict'])
+
+    def test_checkpoint_manager(self):
+        manager = CheckpointManager(self.path, keep_last=1, keep_best=1, metric='eval/acc')
+        for epoch, acc in enumerate([0.5, 0.9, 0.7, 0.6]):
+            file = os.path.join(self.path, 'e-{}_time-0.ckpt'.format(epoch))
+            save_checkpoint({'epoch': epoch}, file)
+            manager.register(file, epoch, {'$eval$_acc': acc})
+        self.assertEqual(sorted(f for f in os.listdir(self.path) if f.endswith('.ckpt')),
+                         ['e-1_time-0.ckpt', 'e-3_time-0.ckpt'])
+        # a new manager only reads the index file
+        manager = CheckpointManager(self.path, metric='eval/acc')
+        self.assertEqual(manager.latest(), os.path.join(self.path, 'e-3_time-0.ckpt'))
+        self.assertEqual(manager.best(), os.path.join(self.path, 'e-1_time-0.ckpt'))
+
+    def test_checkpoint_manager_keep_all(self):
+        # without any limit all checkpoints are kept
+        manager = CheckpointManager(self.path, metric='eval/acc')
+        for epoch, acc in enumerate([0.9, 0.5, 0.7]):
+            file = os.path.join(self.path, 'e-{}_time-0.ckpt'.format(epoch))
+            save_checkpoint({'epoch': epoch}, file)
+            manager.register(file, epoch, {'$eval$_acc': acc})
+        self.assertEqual(len([f for f in os.listdir(self.path) if f.endswith('.ckpt')]), 3)
+
+    def test_checkpoint_manager_keep_best(self):
+        # keep_best without keep_last keeps the latest checkpoint, such that resuming continues from it
+        manager = CheckpointManager(self.path, keep_best=1, metric='eval/acc')
+        for epoch, acc in enumerate([0.9, 0.5, 0.7, 0.6]):
+            file = os.path.join(self.path, 'e-{}_time-0.ckpt'.format(epoch))
+            save_checkpoint({'epoch': epoch}, file)
+            manager.register(file, epoch, {'$eval$_acc': acc})
+        self.assertEqual(sorted(f for f in os.listdir(self.path) if f.endswith('.ckpt')),
+                         ['e-0_time-0.ckpt', 'e-3_time-0.ckpt'])
+        self.assertEqual(manager.latest(), os.path.join(self.path, 'e-3_time-0.ckpt'))
+        self.assertEqual(manager.best(), os.path.join(self.path, 'e-0_time-0.ckpt'))
+
+if __name__ == '__main__':
+    unittest.main()
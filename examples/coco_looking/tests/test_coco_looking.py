@@ -1,6 +1,8 @@
 import os
 import unittest
 
+from box import Box
+
 from lighter.config import Config
 from lighter.context import Context
 from lighter.decorator import inject, config, device, context, search, strategy, InjectOption, reference, hook, \
@@ -131,6 +133,22 @@ class TestLighter(unittest.TestCase):
         usage = Usage()
         self.assertTrue(usage.demo is not None)
 
+    def test_references_plan_invalidation(self):
+        Context.create(parse_args_override=False)
+
+        class Usage:
+            @references(names=['nested.demo'])
+            def __init__(self):
+                pass
+        self.assertIsNone(Usage().demo)
+        # registry mutations and new contexts must invalidate the cached plan
+        registry = Context.get_instance().registry
+        registry.register_instance('nested', Box({'demo': 1}))
+        self.assertEqual(Usage().demo, 1)
+        Context.create(parse_args_override=False)
+        Context.get_instance().registry.register_instance('nested', Box({'demo': 2}))
+        self.assertEqual(Usage().demo, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from lighter.collectible import BaseCollectible, ArrayCollectible
+from lighter.context import Context
+
+
+class TestCollectible(unittest.TestCase):
+    def setUp(self):
+        Context.create(parse_args_override=False, auto_instantiate_types=False, device='cpu')
+        self.values = [0.5, 2.0, -1.0, 3.5, 1.0]
+
+    def test_redux(self):
+        collectible = BaseCollectible()
+        for value in self.values:
+            collectible.update(category='train', loss=value)
+            collectible.update(category='eval', loss=2 * value)
+        self.assertEqual(list(collectible.redux(category='eval').keys()), ['$eval$_loss'])
+        self.assertAlmostEqual(collectible.redux(window=2)['$train$_loss'], np.mean(self.values[-2:]))
+        self.assertAlmostEqual(collectible.redux(func=np.max)['$eval$_loss'], 7.0)
+        # cached reductions are invalidated by updates
+        collectible.update(category='eval', loss=10.0)
+        self.assertAlmostEqual(collectible.redux(func=np.max)['$eval$_loss'], 10.0)
+
+    def test_ema(self):
+        collectible = BaseCollectible()
+        expected = None
+        for value in self.values:
+            collectible.update(category='train', loss=value)
+            expected = value if expected is None else 0.5 * expected + 0.5 * value
+            self.assertAlmostEqual(collectible.ema(alpha=0.5)['$train$_loss'], expected)
+
+    def test_array_collectible(self):
+        expected = BaseCollectible()
+        collectible = ArrayCollectible(capacity=2)
+        for value in self.values:
+            expected.update(category='train', loss=value)
+            collectible.update(category='train', loss=value)
+        for func in [np.mean, np.sum, np.min, np.max]:
+            self.assertAlmostEqual(collectible.redux(func=func)['$train$_loss'],
+                                   expected.redux(func=func)['$train$_loss'])
+        self.assertRaises(ValueError, collectible.redux, func=np.median)
+
+    def test_array_collectible_history(self):
+        collectible = ArrayCollectible(keep_history=True, capacity=2)
+        for value in self.values:
+            collectible.update(category='eval', loss=value)
+        self.assertEqual(collectible.history('$eval$_loss').tolist(), self.values)
+        self.assertAlmostEqual(collectible.redux(func=np.median)['$eval$_loss'], np.median(self.values))
+        self.assertAlmostEqual(collectible.redux(window=2, category='eval')['$eval$_loss'], np.mean(self.values[-2:]))
+        collectible.reset()
+        self.assertEqual(collectible.redux(), {})
+
+    def test_array_collectible_empty_capacity(self):
+        collectible = ArrayCollectible(keep_history=True, capacity=0)
+        for value in self.values:
+            collectible.update(loss=value)
+        self.assertEqual(collectible.history('loss').tolist(), self.values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lighter import scope
+from lighter.config import Config, ConfigCache
+from lighter.context import Context
+from lighter.decorator import config
+
+
+class TestConfigCache(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = ConfigCache.get_instance()
+        self.cache.clear()
+        Context.create(parse_args_override=False, auto_instantiate_types=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _write(self, name, content):
+        file = os.path.join(self.path, name)
+        with open(file, 'w') as f:
+            json.dump(content, f)
+        return file
+
+    def test_hits_and_copies(self):
+        file = self._write('a.json', {'model': {'lr': 0.1, 'layers': [1, 2]}})
+        config = Config(path=file)
+        config.model.lr = 0.2
+        config.model.layers.append(3)
+        # modifications of loaded configs must not leak into the cache
+        config = Config(path=file)
+        self.assertEqual(config.model.lr, 0.1)
+        self.assertEqual(config.model.layers, [1, 2])
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'entries': 1})
+
+    def test_invalidation(self):
+        file = self._write('a.json', {'value': 1})
+        Config(path=file)
+        self._write('a.json', {'value': 22})
+        self.assertEqual(Config(path=file).value, 22)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_imports_and_types(self):
+        nested = self._write('nested.json', {'optimizer': {'lr': 0.1}})
+        file = self._write('a.json', {'strategy': {'import_nested': 'import::' + nested,
+                                                   'metric': 'type::lighter.metric.BaseMetric'}})
+        self.assertEqual(Config(path=file).strategy.optimizer.lr, 0.1)
+        # types are registered again on a cache hit with a new registry
+        context = Context.create(parse_args_override=False, auto_instantiate_types=False)
+        self.assertFalse(context.registry.contains_type('metric'))
+        Config(path=file)
+        self.assertTrue(context.registry.contains_type('metric'))
+        # changes of imported files invalidate the importing file
+        self._write('nested.json', {'optimizer': {'lr': 0.01}})
+        self.assertEqual(Config(path=file).strategy.optimizer.lr, 0.01)
+
+
+class TestConfigCopy(unittest.TestCase):
+    def setUp(self):
+        Context.create(parse_args_override=False, auto_instantiate_types=False)
+        self.config = Config(model={'lr': 0.1, 'layers': {'depth': 2}}, data={'batch_size': 8})
+
+    def test_structural_sharing(self):
+        copy = self.config.copy()
+        # unchanged subtrees are shared and only the nodes along the updated path are copied
+        copy.set_value('model.layers.depth', 3)
+        self.assertEqual(self.config.get_value('model.layers.depth'), 2)
+        self.assertEqual(copy.get_value('model.layers.depth'), 3)
+        self.assertIs(dict.get(copy, 'data'), dict.get(self.config, 'data'))
+        self.assertIsNot(dict.get(copy, 'model'), dict.get(self.config, 'model'))
+
+    def test_copy_path(self):
+        copy = self.config.copy()
+        copy.copy_path('data').batch_size = 16
+        self.assertEqual(self.config.data.batch_size, 8)
+        self.assertEqual(copy.data.batch_size, 16)
+
+    def test_copy_on_write(self):
+        self.config.set_value('data.sizes', [1, 2])
+        copy = self.config.copy()
+        # attribute assignments copy shared properties before they are modified
+        copy.model.layers.depth = 3
+        copy.data.sizes.append(3)
+        self.config.data.batch_size = 16
+        self.assertEqual(self.config.model.layers.depth, 2)
+        self.assertEqual(self.config.data.sizes, [1, 2])
+        self.assertEqual(copy.data.batch_size, 8)
+        self.assertEqual(copy.to_dict(), {'model': {'lr': 0.1, 'layers': {'depth': 3}},
+                                          'data': {'batch_size': 8, 'sizes': [1, 2, 3]}})
+
+    def test_config_decorator(self):
+        path = tempfile.mkdtemp()
+        try:
+            file = os.path.join(path, 'layers.json')
+            with open(file, 'w') as f:
+                json.dump({'depth': 4}, f)
+
+            class Model:
+                @config(path=file, property='model.layers')
+                def __init__(self):
+                    pass
+
+            copy = self.config.copy()
+            scope.set_instance(Config, copy)
+            Model()
+            # imported configs must not leak into other configs sharing the nested properties
+            self.assertEqual(self.config.get_value('model.layers.depth'), 2)
+            self.assertEqual(copy.get_value('model.layers.depth'), 4)
+        finally:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+import contextvars
+import sys
+import threading
+import unittest
+
+from lighter import scope
+from lighter.config import Config
+from lighter.context import Context
+from lighter.registry import Registry
+from lighter.search import ParameterSearch
+from lighter.decorator import context, reference, references, transform
+from lighter.exceptions import TypeInstantiationError
+
+CALLS = []
+
+
+class Transform:
+    def __init__(self):
+        CALLS.append('transform')
+
+
+class Dataset:
+    @transform
+    def __init__(self):
+        CALLS.append('dataset')
+
+
+class Model:
+    @reference(name='dataset')
+    def __init__(self):
+        CALLS.append('model')
+
+
+class Experiment(Model):
+    @references(names=['writer'])
+    def __init__(self):
+        super(Experiment, self).__init__()
+        CALLS.append('experiment')
+
+
+class Left:
+    @reference(name='right')
+    def __init__(self):
+        pass
+
+
+class Right:
+    @reference(name='left')
+    def __init__(self):
+        pass
+
+
+class ReferencingModel:
+    @references
+    def __init__(self):
+        CALLS.append('model')
+
+
+class ReferencingMetric:
+    @references
+    def __init__(self):
+        CALLS.append('metric')
+
+
+class Broken:
+    def __init__(self):
+        raise RuntimeError('broken')
+
+
+class Trial:
+    @context
+    def __init__(self):
+        pass
+
+
+class Consumer:
+    @reference(name='dataset')
+    def __init__(self):
+        pass
+
+
+class TestContext(unittest.TestCase):
+    def setUp(self):
+        del CALLS[:]
+        self.context = Context.create(parse_args_override=False, auto_instantiate_types=False)
+
+    def test_dependencies(self):
+        self.assertEqual(Context.dependencies(Dataset), {'transform'})
+        # dependencies of base class constructors are collected as well
+        self.assertEqual(Context.dependencies(Experiment), {'dataset'})
+        # optional references do not define the instantiation order
+        self.assertEqual(Context.dependencies(Experiment, optional=True), {'dataset', 'writer'})
+
+    def test_topological_order(self):
+        self.context.instantiate_types({'experiment': Experiment, 'model': Model,
+                                        'dataset': Dataset, 'transform': Transform})
+        # every type is constructed exactly once after its dependencies, ties follow the config order
+        self.assertEqual(CALLS, ['transform', 'dataset', 'model', 'experiment', 'model'])
+        self.assertIs(self.context.registry.instances.model.dataset, self.context.registry.instances.dataset)
+
+    def test_parallel_instantiation(self):
+        self.context.instantiate_types({'model': Model, 'dataset': Dataset, 'transform': Transform},
+                                       max_workers=4)
+        self.assertEqual(CALLS, ['transform', 'dataset', 'model'])
+
+    def test_cycle(self):
+        with self.assertRaises(TypeInstantiationError) as error:
+            self.context.instantiate_types({'left': Left, 'right': Right, 'transform': Transform})
+        self.assertIn('left -> right -> left', str(error.exception))
+        self.assertEqual(CALLS, ['transform'])
+
+    def test_failure(self):
+        with self.assertRaises(TypeInstantiationError) as error:
+            self.context.instantiate_types({'transform': Broken, 'dataset': Dataset, 'model': Model})
+        self.assertIn('failed types: transform; skipped types: dataset, model', str(error.exception))
+
+    def test_optional_references(self):
+        # cycles of optional references are broken in config order, every type is constructed once
+        self.context.instantiate_types({'model': ReferencingModel, 'metric': ReferencingMetric})
+        self.assertEqual(CALLS, ['model', 'metric'])
+        self.assertIs(self.context.registry.instances.metric.model, self.context.registry.instances.model)
+
+    def test_optional_order(self):
+        # optional references order the instantiation as well, if they do not form a cycle
+        self.context.instantiate_types({'metric': ReferencingMetric, 'model': Model,
+                                        'dataset': Dataset, 'transform': Transform})
+        self.assertEqual(CALLS, ['transform', 'dataset', 'model', 'metric'])
+        self.assertIs(self.context.registry.instances.metric.model, self.context.registry.instances.model)
+
+    def test_lazy_instantiation(self):
+        self.context.instantiate_types({'model': Model, 'dataset': Dataset, 'transform': Transform}, lazy=True)
+        self.assertEqual(CALLS, [])
+        report = self.context.report()
+        self.assertFalse(any(entry['materialized'] for entry in report.values()))
+        # accessing the model materializes its injected dependencies only when they are used
+        model = self.context.registry.instances.model
+        self.assertIsInstance(model, Model)
+        self.assertEqual(CALLS, ['model'])
+        self.assertIsInstance(model.dataset, Dataset)
+        self.assertEqual(CALLS, ['model', 'dataset'])
+        report = self.context.report()
+        self.assertTrue(report['model']['materialized'])
+        self.assertFalse(report['transform']['materialized'])
+        # materialized proxies are replaced in the registry
+        self.assertIs(type(self.context.registry.instances.model), Model)
+
+    def test_scoped_instances(self):
+        token = scope.push()
+        try:
+            self.assertIsNone(Context.get_instance())
+            context = Context.create(parse_args_override=False, auto_instantiate_types=False)
+            self.assertIsNot(context, self.context)
+            self.assertIs(Registry.get_instance(), context.registry)
+            # threads see the scope only if they run within a copy of the current context
+            seen = []
+            threads = [threading.Thread(target=lambda: seen.append(Context.get_instance())),
+                       threading.Thread(target=contextvars.copy_context().run,
+                                        args=(lambda: seen.append(Context.get_instance()),))]
+            for thread in threads:
+                thread.start()
+                thread.join()
+            self.assertEqual(seen, [self.context, context])
+        finally:
+            scope.pop(token)
+        self.assertIs(Context.get_instance(), self.context)
+        self.assertIs(Registry.get_instance(), self.context.registry)
+
+    def test_context_scope(self):
+        results = {}
+        barrier = threading.Barrier(2)
+
+        def run(value):
+            with Context.scope(config_dict={'trial': {'value': value}}, auto_instantiate_types=False) as context:
+                context.registry.register_instance('transform', value)
+                # both scopes are active at the same time
+                barrier.wait()
+                trial = Trial()
+                results[value] = (trial.config.trial.value, trial.registry.instances.transform, trial.context)
+        threads = [threading.Thread(target=run, args=(value,)) for value in (1, 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results[1][:2], (1, 1))
+        self.assertEqual(results[2][:2], (2, 2))
+        self.assertIsNot(results[1][2], results[2][2])
+
+    def test_scope_locks(self):
+        created = threading.Event()
+
+        def run():
+            with Context.scope(auto_instantiate_types=False):
+                created.set()
+        # scopes do not wait for the creation locks of the process-wide instances
+        with Config._mutex, Registry._mutex, ParameterSearch._mutex:
+            thread = threading.Thread(target=run)
+            thread.start()
+            self.assertTrue(created.wait(10))
+        thread.join()
+
+    def test_scoped_injection(self):
+        leaks = []
+        barrier = threading.Barrier(4)
+
+        def run(value):
+            with Context.scope(auto_instantiate_types=False) as context:
+                context.registry.register_instance('dataset', value)
+                barrier.wait()
+                # the injection plans of concurrent scopes must not resolve the registry of another scope
+                for _ in range(20000):
+                    if Consumer().dataset != value:
+                        leaks.append(value)
+        threads = [threading.Thread(target=run, args=(value,)) for value in range(4)]
+        # switch threads frequently to interleave the plan resolution
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(leaks, [])
+        self.assertIs(Context.get_instance(), self.context)
+
+
+if __name__ == '__main__':
+    unittest.main()
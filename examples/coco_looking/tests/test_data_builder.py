@@ -0,0 +1,65 @@
+import copy
+import pickle
+import unittest
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from lighter.context import Context
+from lighter.data_builder import BaseDataBuilder, DevicePrefetcher
+
+
+class Dataset(TensorDataset):
+    def __init__(self):
+        super(Dataset, self).__init__(torch.arange(10).float())
+
+
+class DataBuilder(BaseDataBuilder):
+    def loader(self):
+        return self.prefetch(DataLoader(self.dataset, batch_size=3, **self.loader_options())), None
+
+
+class TestDevicePrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.loader = DataLoader(TensorDataset(torch.arange(10).float()), batch_size=3)
+
+    def test_iteration(self):
+        prefetcher = DevicePrefetcher(self.loader, 'cpu', depth=2)
+        self.assertEqual(len(prefetcher), 4)
+        self.assertEqual(prefetcher.batch_size, 3)
+        for _ in range(2):
+            batches = [batch[0].tolist() for batch in prefetcher]
+            self.assertEqual(batches, [[0., 1., 2.], [3., 4., 5.], [6., 7., 8.], [9.]])
+
+    def test_copy(self):
+        prefetcher = DevicePrefetcher([[torch.ones(1)]], 'cpu')
+        for other in [copy.copy(prefetcher), pickle.loads(pickle.dumps(prefetcher))]:
+            self.assertEqual([batch[0].tolist() for batch in other], [[1.]])
+
+
+class TestDataBuilder(unittest.TestCase):
+    def create(self, **options) -> BaseDataBuilder:
+        Context.create(config_dict={'dataset': 'type::{}.Dataset'.format(__name__),
+                                    'builder': 'type::{}.DataBuilder'.format(__name__),
+                                    'data_builder': options},
+                       parse_args_override=False, device='cpu')
+        return Context.get_instance().registry.instances['builder']
+
+    def test_loader_options(self):
+        builder = self.create(num_workers=0, pin_memory=True, persistent_workers=True, prefetch_factor=2,
+                              batch_size=3)
+        # worker options require worker processes and memory is only pinned for cuda devices
+        self.assertEqual(builder.loader_options(), {'num_workers': 0})
+        builder = self.create(num_workers=1, persistent_workers=True, prefetch_factor=4)
+        self.assertEqual(builder.loader_options(), {'num_workers': 1, 'persistent_workers': True, 'prefetch_factor': 4})
+
+    def test_prefetch(self):
+        train_loader, _ = self.create(prefetch_to_device=2).loader()
+        self.assertIsInstance(train_loader, DevicePrefetcher)
+        self.assertEqual(sum(len(batch[0]) for batch in train_loader), 10)
+        train_loader, _ = self.create().loader()
+        self.assertIsInstance(train_loader, DataLoader)
+
+
+if __name__ == '__main__':
+    unittest.main()
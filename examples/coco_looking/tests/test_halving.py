@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lighter.config import Config
+from lighter.context import Context
+from lighter.decorator import context, references
+from lighter.experiment import DefaultExperiment
+from lighter.halving import SuccessiveHalving, Hyperband
+from lighter.parameter import ListParameter
+from lighter.search import SearchSpace
+from tests.test_training import create_modules
+
+EPOCHS = []
+
+
+class Trial:
+    @context
+    def __init__(self):
+        self.epochs = 100
+        self.resume_from = None
+        self.metrics = []
+
+    def run(self):
+        # resumes after the last epoch of the previous rung
+        state = os.path.join(self.resume_from, 'epoch')
+        start = 0
+        if os.path.exists(state):
+            with open(state) as file:
+                start = int(file.read())
+        for epoch in range(start, self.epochs):
+            EPOCHS.append((self.config.lr, epoch))
+            self.metrics.append({'$eval$_loss': self.config.lr / (epoch + 1)})
+        os.makedirs(self.resume_from, exist_ok=True)
+        with open(state, 'w') as file:
+            file.write(str(self.epochs))
+
+
+class Experiment(DefaultExperiment):
+    @references
+    def __init__(self):
+        super(Experiment, self).__init__()
+
+    def pre_epoch(self):
+        EPOCHS.append((self.config.lr, self.epoch))
+
+
+class TestSuccessiveHalving(unittest.TestCase):
+    def setUp(self):
+        Context.create(parse_args_override=False, auto_instantiate_types=False)
+        self.path = tempfile.mkdtemp()
+        self.space = SearchSpace([ListParameter(ref='lr', options=list(range(1, 10)))], Config(lr=0))
+        del EPOCHS[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_halving(self):
+        halving = SuccessiveHalving(self.space, __name__ + '.Trial', metric='$eval$_loss', mode='min',
+                                    min_epochs=1, max_epochs=9, eta=3, output_path=self.path)
+        self.assertEqual(halving.rungs(9), [(9, 1), (3, 3), (1, 9)])
+        # the last rung trains up to the maximum budget
+        self.assertEqual(halving.rungs(10, min_epochs=3), [(10, 3), (3, 9)])
+        self.assertEqual(halving.rungs(2), [(2, 9)])
+        trials = halving.run()
+        self.assertEqual([(trial.config.lr, trial.epochs) for trial in trials], [(1, 9)])
+        self.assertAlmostEqual(trials[0].value, 1 / 9)
+        # promoted trials only train the additional epochs of their rung
+        self.assertEqual(len(EPOCHS), 9 * 1 + 3 * 2 + 1 * 6)
+        self.assertEqual(sorted(set(lr for lr, epoch in EPOCHS if epoch > 0)), [1, 2, 3])
+
+    def test_workers(self):
+        halving = SuccessiveHalving(self.space, __name__ + '.Trial', metric='$eval$_loss', mode='min',
+                                    min_epochs=1, max_epochs=9, eta=3, output_path=self.path, device='cpu',
+                                    num_workers=2)
+        trials = halving.run()
+        self.assertEqual([(trial.config.lr, trial.epochs, trial.value) for trial in trials], [(1, 9, 1 / 9)])
+        with open(os.path.join(trials[0].path, 'epoch')) as file:
+            self.assertEqual(file.read(), '9')
+
+    def test_hyperband(self):
+        hyperband = Hyperband(self.space, __name__ + '.Trial', metric='$eval$_loss', mode='min',
+                              min_epochs=1, max_epochs=9, eta=3, output_path=self.path)
+        self.assertEqual(hyperband.brackets(), [(9, 1), (5, 3), (3, 9)])
+        trials = hyperband.run(seed=0)
+        self.assertEqual(len(trials), 3)
+        self.assertEqual(trials[0].config.lr, 1)
+
+    def test_experiment(self):
+        modules = create_modules(collectible='lighter.collectible.BaseCollectible')
+        space = SearchSpace([ListParameter(ref='lr', options=[0., 0.01, 0.1])], Config(lr=0, modules=modules))
+        halving = SuccessiveHalving(space, __name__ + '.Experiment', metric='$train$_loss', mode='min',
+                                    min_epochs=1, max_epochs=3, eta=3, output_path=self.path)
+        trials = halving.run()
+        self.assertEqual([trial.epochs for trial in trials], [3])
+        self.assertIsNotNone(trials[0].value)
+        # the promoted trial resumes from the checkpoint of its first rung
+        lr = trials[0].config.lr
+        self.assertEqual(EPOCHS, [(0., 0), (0.01, 0), (0.1, 0), (lr, 1), (lr, 2)])
+        self.assertEqual(sorted(file.split('_')[0] for file in os.listdir(trials[0].path) if file.endswith('.ckpt')),
+                         ['e-0', 'e-1', 'e-2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
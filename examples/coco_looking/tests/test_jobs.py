@@ -0,0 +1,134 @@
+import json
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import torch
+
+from lighter.decorator import context
+from lighter.jobs import JobQueue, PENDING, RUNNING, DONE, FAILED
+from lighter.scheduler import Executor, ResourcePlan, Scheduler, Slot, CUDA_CONTEXT_MEMORY, QUEUE_FILE
+
+RUNS = []
+
+
+class Trial:
+    @context
+    def __init__(self):
+        pass
+
+    def __call__(self):
+        RUNS.append(self.config.trial)
+        if self.config.trial == 'broken':
+            raise RuntimeError('broken trial')
+        if self.config.trial == 'crash':
+            os._exit(3)
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.queue = JobQueue(os.path.join(self.path, QUEUE_FILE), max_retries=1)
+        del RUNS[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_queue(self):
+        self.assertEqual(self.queue.add(['a.json', 'b.json']), 2)
+        self.assertEqual(self.queue.add(['a.json']), 0)
+        job = self.queue.acquire('cpu:0')
+        self.assertEqual((job.file, job.attempts), ('a.json', 1))
+        self.assertEqual(self.queue.progress()['workers'], {'cpu:0': 'a.json'})
+        # failed jobs are retried until max_retries is exceeded
+        self.queue.fail(job, 'error')
+        job = self.queue.acquire('cpu:1')
+        self.assertEqual((job.file, job.attempts), ('a.json', 2))
+        self.queue.fail(job, 'error')
+        self.queue.complete(self.queue.acquire('cpu:0'))
+        self.assertIsNone(self.queue.acquire('cpu:0'))
+        progress = self.queue.progress()
+        self.assertEqual((progress[PENDING], progress[RUNNING], progress[DONE], progress[FAILED]), (0, 0, 1, 1))
+
+    def test_worker(self):
+        for trial in ['first', 'broken', 'second']:
+            with open(os.path.join(self.path, '{}.json'.format(trial)), 'w') as file:
+                json.dump({'trial': trial}, file)
+        scheduler = Scheduler(path=self.path, experiment=__name__ + '.Trial', device_name='cpu', dynamic=True)
+        scheduler.build_queue()
+        # the worker parses command line overrides, which must not see the arguments of the test runner
+        with mock.patch.object(sys, 'argv', sys.argv[:1]):
+            Executor.worker('cpu:0', None, __name__ + '.Trial', 'cpu', queue=scheduler.queue)
+        self.assertEqual(RUNS, ['broken', 'first', 'second'])
+        self.assertEqual([job['status'] for job in scheduler.queue.jobs()], [FAILED, DONE, DONE])
+        self.assertIn('broken trial', scheduler.queue.jobs(FAILED)[0]['error'])
+
+
+class TestResourcePlan(unittest.TestCase):
+    def test_packing(self):
+        # trials are limited by the thread budgets on the cores and the memory ceiling of the devices
+        plan = ResourcePlan('cpu', num_devices=2, memory=3, threads=2, memory_limit=10, cores=range(16))
+        self.assertEqual(plan.trials_per_device(), 3)
+        slots = plan.slots()
+        self.assertEqual([slot.process_id for slot in slots[:4]], ['cpu:0.0', 'cpu:0.1', 'cpu:0.2', 'cpu:1.0'])
+        self.assertEqual([slot.cores for slot in slots[2:4]], [[4, 5], [8, 9]])
+        self.assertEqual(set(slot.device for slot in slots), {'cpu'})
+        plan = ResourcePlan('cuda', num_devices=2, memory=4, threads=1, memory_limit=10, cores=range(8), overhead=1)
+        self.assertEqual([(slot.device, slot.cores) for slot in plan.slots()],
+                         [('cuda:0', None), ('cuda:0', None), ('cuda:1', None), ('cuda:1', None)])
+        # each process on a cuda device holds its own context besides the measured trial memory
+        plan = ResourcePlan('cuda', memory=2 ** 30, memory_limit=4 * 2 ** 30, cores=range(8))
+        self.assertEqual(plan.process_memory(), 2 ** 30 + CUDA_CONTEXT_MEMORY)
+        self.assertEqual(plan.trials_per_device(), 2)
+
+    def test_schedule(self):
+        path = tempfile.mkdtemp()
+        try:
+            for trial in ['first', 'second', 'third']:
+                with open(os.path.join(path, '{}.json'.format(trial)), 'w') as file:
+                    json.dump({'trial': trial}, file)
+            plan = ResourcePlan('cpu', memory=1, threads=1, max_trials=2, cores=range(4))
+            scheduler = Scheduler(path=path, experiment=__name__ + '.Trial', device_name='cpu', resources=plan)
+            scheduler.build_schedule()
+            with open(scheduler.schedule_file) as file:
+                schedule = json.load(file)
+            self.assertEqual({k: [os.path.basename(f) for f in v] for k, v in schedule.items()},
+                             {'cpu:0.0': ['first.json', 'third.json'], 'cpu:0.1': ['second.json']})
+            # a probe executes a single experiment and reports the peak memory
+            del RUNS[:]
+            results = queue.Queue()
+            slot = Slot('cpu:0.0', 'cpu', torch.get_num_threads(), None)
+            with mock.patch.object(sys, 'argv', sys.argv[:1]):
+                Executor.worker(slot.process_id, scheduler.schedule_file, __name__ + '.Trial', 'cpu', slot=slot,
+                                limit=1, results=results)
+            self.assertEqual(RUNS, ['first'])
+            memory, baseline = results.get_nowait()
+            # on cpu the memory of the interpreter is measured as process overhead besides the trial
+            self.assertGreaterEqual(memory, 0)
+            self.assertGreater(baseline, 0)
+        finally:
+            shutil.rmtree(path)
+
+    def test_probe(self):
+        path = tempfile.mkdtemp()
+        try:
+            for trial in ['crash', 'second']:
+                with open(os.path.join(path, '{}.json'.format(trial)), 'w') as file:
+                    json.dump({'trial': trial}, file)
+            plan = ResourcePlan('cpu', threads=1, max_trials=2)
+            scheduler = Scheduler(path=path, experiment=__name__ + '.Trial', device_name='cpu', resources=plan)
+            # a probe process which exits without reporting its peak memory fails the run
+            with mock.patch.object(sys, 'argv', sys.argv[:1]):
+                with self.assertRaisesRegex(RuntimeError, 'exited with code 3'):
+                    scheduler.probe()
+            self.assertIsNone(plan.memory)
+        finally:
+            shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
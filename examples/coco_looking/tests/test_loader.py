@@ -0,0 +1,35 @@
+import unittest
+from unittest import mock
+
+from lighter.context import Context
+from lighter.loader import Loader
+from lighter.metric import BaseMetric
+
+
+class TestLoader(unittest.TestCase):
+    def setUp(self):
+        Loader.clear_cache()
+
+    def test_cache(self):
+        with mock.patch('importlib.import_module', wraps=__import__('importlib').import_module) as import_module:
+            self.assertIs(Loader.import_path('lighter.metric.BaseMetric'), BaseMetric)
+            self.assertIs(Loader.import_path('lighter.metric.BaseMetric'), BaseMetric)
+            self.assertEqual(import_module.call_count, 1)
+
+    def test_failures_warn_once(self):
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertIsNone(Loader.import_path('lighter.metric.Missing'))
+            self.assertIsNone(Loader.import_path('lighter.metric.Missing'))
+        self.assertEqual(len([line for line in logs.output if 'Could not import' in line]), 1)
+
+    def test_import_modules_and_prewarm(self):
+        context = Context.create(parse_args_override=False, auto_instantiate_types=False)
+        Loader.import_modules({'metric': 'lighter.metric.BaseMetric', 'eval_metric': 'lighter.metric.BaseMetric'})
+        self.assertIs(context.registry.types.eval_metric, BaseMetric)
+        types = Loader.prewarm({'strategy': {'metric': 'type::lighter.metric.BaseMetric', 'lr': 0.1},
+                                'models': ['type::lighter.model.BaseModule']})
+        self.assertEqual(list(types.keys()), ['lighter.metric.BaseMetric', 'lighter.model.BaseModule'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import torch
+
+from lighter.collectible import BaseCollectible, StreamingCollectible
+from lighter.context import Context
+from lighter.functional.metric import TP, TN, FP, FN, ACC, confusion_counts, confusion_counts_thresholds
+from lighter.metric import BaseMetric, StreamingMetric
+
+
+class TestMetric(unittest.TestCase):
+    def setUp(self):
+        Context.create(parse_args_override=False, auto_instantiate_types=False, device='cpu')
+        torch.manual_seed(0)
+        self.prediction = torch.rand(64, 1)
+        self.target = (torch.rand(64, 1) > 0.5).float()
+
+    def test_confusion_counts(self):
+        counts = confusion_counts(self.target, self.prediction)
+        expected = [f(self.target, self.prediction) for f in [TP, TN, FP, FN]]
+        self.assertEqual(counts.tolist(), torch.stack(expected).tolist())
+        self.assertAlmostEqual(ACC(self.target, self.prediction).item(),
+                               ACC(None, None, counts=counts).item(), places=6)
+
+    def test_confusion_counts_thresholds(self):
+        thresholds = [0.25, 0.5, 0.75]
+        counts = confusion_counts_thresholds(self.target, self.prediction, thresholds)
+        self.assertEqual(tuple(counts.shape), (4, 3))
+        for i, threshold in enumerate(thresholds):
+            prediction = (self.prediction > threshold).float()
+            self.assertEqual(counts[:, i].tolist(), confusion_counts(self.target, prediction).tolist())
+        self.assertEqual(tuple(ACC(None, None, counts=counts).shape), (3,))
+
+    def test_streaming_metric(self):
+        expected = BaseMetric()(self.prediction, self.target)
+        metric = StreamingMetric()
+        metric.update(self.prediction[:32], self.target[:32], category='eval')
+        metric.update(self.prediction[32:], self.target[32:], category='eval')
+        redux = metric.redux()
+        for key, value in expected.items():
+            self.assertAlmostEqual(redux[BaseCollectible.key(key, 'eval')], value, places=5)
+
+    def test_streaming_collectible(self):
+        collectible = StreamingCollectible()
+        losses = [torch.tensor(0.5), torch.tensor(1.5), 2.5]
+        for loss in losses:
+            collectible.update(category='train', loss=loss)
+        redux = collectible.redux()
+        self.assertAlmostEqual(redux['$train$_loss'], 1.5, places=5)
+        self.assertRaises(ValueError, collectible.redux, func=np.max)
+        collectible.reset()
+        self.assertEqual(collectible.redux(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import queue
+import unittest
+
+from lighter.decorator import context
+from lighter.jobs import DONE, FAILED
+from lighter.scheduler import WorkerPool, DEFAULT_REUSE
+
+BUILDS = []
+
+
+class Data:
+    @context
+    def __init__(self):
+        BUILDS.append(self.config.dataset.size)
+
+
+class Trial:
+    @context
+    def __init__(self):
+        pass
+
+    def __call__(self):
+        if self.config.trial == 'broken':
+            raise RuntimeError('broken trial')
+        dataset = self.registry.instances['dataset']
+        return self.config.trial, id(dataset), dataset.config.trial, dataset.context is self.context
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        del BUILDS[:]
+
+    def run_trials(self, trials, reuse):
+        tasks, results = queue.Queue(), queue.Queue()
+        for i, (trial, size) in enumerate(trials):
+            tasks.put((i, {'trial': trial,
+                           'modules': {'dataset': 'type::{}.Data'.format(__name__)},
+                           'dataset': {'size': size}}))
+        tasks.put(None)
+        WorkerPool.work('cpu:0', 'cpu', __name__ + '.Trial', reuse, tasks, results)
+        return [results.get_nowait() for _ in trials]
+
+    def test_reuse(self):
+        results = self.run_trials([('a', 1), ('b', 1), ('broken', 1), ('c', 2)], reuse=DEFAULT_REUSE)
+        self.assertEqual([result.status for result in results], [DONE, DONE, FAILED, DONE])
+        self.assertIn('broken trial', results[2].error)
+        # the dataset is only rebuilt if its config subtree changes
+        self.assertEqual(BUILDS, [1, 2])
+        self.assertEqual(results[0].result[1], results[1].result[1])
+        self.assertEqual(results[3].result[0], 'c')
+        # reused instances are bound to the context of the current trial
+        self.assertEqual([result.result[2:] for result in results if result.status == DONE],
+                         [('a', True), ('b', True), ('c', True)])
+
+    def test_default_reuse(self):
+        pool = WorkerPool(__name__ + '.Trial', device_name='cpu')
+        self.assertEqual(pool.reuse, DEFAULT_REUSE)
+
+    def test_no_reuse(self):
+        self.run_trials([('a', 1), ('b', 1)], reuse=None)
+        self.assertEqual(BUILDS, [1, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lighter.config import Config, ConfigCache
+from lighter.context import Context
+from lighter.loader import Loader
+from lighter.profiler import Profiler
+
+
+class Component:
+    pass
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.profiler = Profiler.get_instance()
+        self.profiler.clear()
+        self.profiler.enable()
+        Loader.clear_cache()
+
+    def tearDown(self):
+        self.profiler.disable()
+        shutil.rmtree(self.path)
+
+    def test_startup_spans(self):
+        context = Context.create(parse_args_override=False, auto_instantiate_types=False)
+        Loader.import_path('lighter.metric.BaseMetric')
+        file = os.path.join(self.path, 'a.json')
+        with open(file, 'w') as f:
+            json.dump({'value': 1}, f)
+        ConfigCache.get_instance().clear()
+        Config(path=file)
+        context.instantiate_types({'component': Component})
+
+        report = self.profiler.report()
+        self.assertEqual(report['import'][0][:2], ('lighter.metric.BaseMetric', 1))
+        self.assertEqual(report['config'][0][:2], (os.path.abspath(file), 1))
+        self.assertEqual(report['instantiate'][0][:2], ('component', 1))
+
+        trace = os.path.join(self.path, 'trace.json')
+        self.profiler.dump(trace)
+        with open(trace) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(sorted(event['cat'] for event in events), ['config', 'import', 'instantiate'])
+
+    def test_disabled(self):
+        self.profiler.disable()
+        Loader.import_path('lighter.metric.BaseMetric')
+        self.assertEqual(self.profiler.report(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from lighter.config import Config
+from lighter.context import Context
+from lighter.parameter import GridParameter, ListParameter, BinaryParameter, SetParameter
+from lighter.search import SearchSpace
+
+
+class TestSearchSpace(unittest.TestCase):
+    def setUp(self):
+        Context.create(parse_args_override=False, auto_instantiate_types=False)
+        self.config = Config(optimizer={'lr': 0.1}, model={'hidden_units': 10})
+
+    def test_iteration_order(self):
+        space = SearchSpace([ListParameter(ref='optimizer.lr', options=[0.1, 0.01]),
+                             BinaryParameter(ref='model.freeze'),
+                             SetParameter(ref='model.output', option=1)], self.config)
+        self.assertEqual(len(space), 4)
+        values = [(config.optimizer.lr, config.model.freeze, config.model.output) for config in space]
+        self.assertEqual(values, [(0.1, False, 1), (0.1, True, 1), (0.01, False, 1), (0.01, True, 1)])
+        # the base config stays unchanged
+        self.assertEqual(self.config.optimizer.lr, 0.1)
+
+    def test_random_access(self):
+        space = SearchSpace([GridParameter(ref='model.hidden_units', min=0, max=999, step=1),
+                             GridParameter(ref='optimizer.lr', min=0, max=99, step=1),
+                             ListParameter(ref='model.depth', options=[1, 2])], self.config)
+        self.assertEqual(len(space), 200000)
+        self.assertEqual(space.indices(12345), (61, 72, 1))
+        config = space[12345]
+        self.assertEqual((config.model.hidden_units, config.optimizer.lr, config.model.depth), (61, 72, 2))
+        self.assertEqual(space.values(-1), [999, 99, 2])
+        with self.assertRaises(IndexError):
+            space[len(space)]
+        configs = list(space.sample(3, seed=0))
+        self.assertEqual(len(set(config.experiment_id for config in configs)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
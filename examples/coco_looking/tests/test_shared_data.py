@@ -0,0 +1,53 @@
+import os
+import pickle
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from lighter.dataset import SharedDataCache
+
+
+class TestSharedDataCache(unittest.TestCase):
+    def setUp(self):
+        self.owner = SharedDataCache('test_shared_data')
+
+    def tearDown(self):
+        self.owner.clear()
+
+    def test_share(self):
+        image = np.arange(24, dtype=np.uint8).reshape((2, 4, 3))
+        self.assertIsNone(self.owner.get('a.jpg'))
+        shared = self.owner.put('a.jpg', image)
+        np.testing.assert_array_equal(shared, image)
+        self.assertFalse(shared.flags.writeable)
+        # a copy attaches to the segments by name, e.g. within a data loader worker
+        other = pickle.loads(pickle.dumps(self.owner))
+        np.testing.assert_array_equal(other.get('a.jpg'), image)
+        self.assertIsNone(other.get('b.jpg'))
+        # keys which are already stored by another process are not shared again
+        self.assertIs(other.put('a.jpg', image), image)
+        other.clear()
+        del shared
+        self.owner.clear()
+        self.assertIsNone(other.get('a.jpg'))
+
+    def test_attach_process(self):
+        image = np.arange(6, dtype=np.uint8)
+        self.owner.put('a.jpg', image)
+        # an unrelated process attaching to a segment must not remove it when it exits
+        script = ('from multiprocessing import resource_tracker\n'
+                  'from lighter.dataset import SharedDataCache\n'
+                  'assert SharedDataCache("test_shared_data").get("a.jpg") is not None\n'
+                  '# waits for the resource tracker, which removes the segments still registered on exit\n'
+                  'resource_tracker._resource_tracker._stop()\n')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.run([sys.executable, '-c', script], env=env, check=True)
+        other = SharedDataCache('test_shared_data')
+        np.testing.assert_array_equal(other.get('a.jpg'), image)
+        other.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
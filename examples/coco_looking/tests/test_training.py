@@ -0,0 +1,147 @@
+import copy
+import shutil
+import tempfile
+import unittest
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from lighter.context import Context
+from lighter.data_builder import BaseDataBuilder
+from lighter.decorator import references, model
+from lighter.experiment import DefaultExperiment
+from lighter.optimizer import BaseOptimizer
+
+DTYPES = []
+
+
+class Dataset(TensorDataset):
+    def __init__(self):
+        generator = torch.Generator().manual_seed(0)
+        super(Dataset, self).__init__(torch.rand(6, 4, generator=generator), torch.rand(6, 1, generator=generator))
+
+
+class DataBuilder(BaseDataBuilder):
+    def loader(self):
+        return DataLoader(self.dataset, batch_size=2), None
+
+
+class Model(torch.nn.Linear):
+    def __init__(self):
+        super(Model, self).__init__(4, 1)
+
+
+class Optimizer(BaseOptimizer):
+    @model
+    def __init__(self):
+        super(Optimizer, self).__init__()
+        self.optimizer = torch.optim.SGD(self.model.parameters(), lr=self.config.get('lr', 1.))
+
+
+class Criterion(torch.nn.MSELoss):
+    def forward(self, prediction, target):
+        DTYPES.append(prediction.dtype)
+        return super(Criterion, self).forward(prediction.float(), target)
+
+
+class Metric(object):
+    def __call__(self, prediction, target):
+        return {}
+
+
+class Collectible(object):
+    def update(self, category=None, **kwargs):
+        pass
+
+    def redux(self, func=None, category=None):
+        return {}
+
+    def reset(self):
+        pass
+
+
+class Writer(object):
+    def write(self, category=None, **kwargs):
+        pass
+
+    def step(self):
+        pass
+
+    def flush(self):
+        pass
+
+
+class Experiment(DefaultExperiment):
+    @references
+    def __init__(self):
+        super(Experiment, self).__init__(epochs=1, enable_checkpoints=False)
+
+
+def create_modules(**types) -> dict:
+    """
+    Returns the module types of the synthetic experiment, types overrides components by their full path.
+    """
+    modules = {name: '{}.{}'.format(__name__, type_) for name, type_ in
+               [('dataset', 'Dataset'), ('data_builder', 'DataBuilder'), ('model', 'Model'), ('optimizer', 'Optimizer'),
+                ('criterion', 'Criterion'), ('metric', 'Metric'), ('collectible', 'Collectible'),
+                ('writer', 'Writer')]}
+    modules.update(types)
+    return {name: 'type::' + path for name, path in modules.items()}
+
+
+def create_experiment(checkpoints_dir: str, **options) -> Experiment:
+    Context.create(config_dict={'modules': create_modules(), 'experiment': options}, parse_args_override=False,
+                   device='cpu')
+    experiment = Experiment()
+    experiment.checkpoints_dir = checkpoints_dir
+    return experiment
+
+
+class TestTraining(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        del DTYPES[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def step(self, model, batches):
+        # reference update of the plain model with the averaged gradient of the batches
+        model.zero_grad()
+        loss = sum(torch.nn.functional.mse_loss(model(x), y) for x, y in batches) / len(batches)
+        loss.backward()
+        with torch.no_grad():
+            for param in model.parameters():
+                param -= param.grad
+
+    def test_bf16(self):
+        experiment = create_experiment(self.path, precision='bf16')
+        experiment.run()
+        self.assertEqual(set(DTYPES), {torch.bfloat16})
+        self.assertTrue(all(param.dtype == torch.float32 and torch.isfinite(param).all()
+                            for param in experiment.model.parameters()))
+
+    def test_accumulation(self):
+        # three batches accumulated in a single step equal a step on the full batch
+        experiment = create_experiment(self.path, accumulation_steps=3)
+        reference = copy.deepcopy(experiment.model)
+        batches = list(experiment.data_builder.loader()[0])
+        experiment.run()
+        self.step(reference, batches)
+        for param, expected in zip(experiment.model.parameters(), reference.parameters()):
+            self.assertTrue(torch.allclose(param, expected, atol=1e-6))
+
+    def test_accumulation_remainder(self):
+        # the remaining batch of the epoch is stepped with its own unscaled gradient
+        experiment = create_experiment(self.path, accumulation_steps=2)
+        reference = copy.deepcopy(experiment.model)
+        batches = list(experiment.data_builder.loader()[0])
+        experiment.run()
+        self.step(reference, batches[:2])
+        self.step(reference, batches[2:])
+        for param, expected in zip(experiment.model.parameters(), reference.parameters()):
+            self.assertTrue(torch.allclose(param, expected, atol=1e-6))
+
+
+if __name__ == '__main__':
+    unittest.main()
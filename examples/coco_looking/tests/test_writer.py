@@ -0,0 +1,61 @@
+import shutil
+import tempfile
+import threading
+import unittest
+
+from lighter.context import Context
+from lighter.writer import AsyncWriter
+
+
+class TestAsyncWriter(unittest.TestCase):
+    def setUp(self):
+        Context.create(parse_args_override=False, auto_instantiate_types=False)
+        self.path = tempfile.mkdtemp()
+        self.scalars = []
+        self.writer = AsyncWriter(log_dir=self.path, max_pending=2)
+        self.writer.add_scalar = lambda tag, value, step: self.scalars.append((tag, value, step))
+
+    def tearDown(self):
+        self.writer.close()
+        shutil.rmtree(self.path)
+
+    def test_order(self):
+        for step in range(3):
+            self.writer.write(category='train', **{'$train$_loss': step, '$eval$_acc': 1.})
+            self.writer.flush()
+            self.writer.step()
+        self.assertEqual(self.scalars, [('train/loss', 0, 0), ('train/loss', 1, 1), ('train/loss', 2, 2)])
+        self.assertEqual((self.writer.written, self.writer.dropped), (3, 0))
+
+    def test_close(self):
+        for step in range(2):
+            self.writer.write(loss=step)
+        self.writer.close()
+        self.assertFalse(self.writer.thread.is_alive())
+        self.assertEqual(self.scalars, [('loss', 0, 0), ('loss', 1, 0)])
+        # writes after close are ignored, such that flush does not wait for the stopped thread
+        self.writer.write(loss=2)
+        self.writer.flush()
+        self.assertEqual(self.writer.queue_depth, 0)
+
+    def test_dropped(self):
+        started, release = threading.Event(), threading.Event()
+
+        def add_scalar(tag, value, step):
+            started.set()
+            release.wait()
+            self.scalars.append((tag, value, step))
+        self.writer.add_scalar = add_scalar
+        # the first batch blocks the worker, the next two fill the queue and the last is dropped
+        self.writer.write(loss=0)
+        started.wait()
+        for value in range(1, 4):
+            self.writer.write(loss=value)
+        self.assertEqual((self.writer.queue_depth, self.writer.dropped), (2, 1))
+        release.set()
+        self.writer.flush()
+        self.assertEqual([value for _, value, _ in self.scalars], [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,10 +33,10 @@ class DataBuilder(BaseDataBuilder):
         train_loader = torch.utils.data.DataLoader(self.dataset,
                                                    batch_size=batch_size,
                                                    sampler=train_sampler,
-                                                   num_workers=4)
+                                                   **self.loader_options())
         validation_loader = torch.utils.data.DataLoader(self.dataset,
                                                         batch_size=batch_size,
                                                         sampler=valid_sampler,
-                                                        num_workers=4)
+                                                        **self.loader_options())
 
-        return train_loader, validation_loader
+        return self.prefetch(train_loader), self.prefetch(validation_loader)
@@ -1,19 +1,18 @@
-from . import collectible
-from . import config
-from . import context
-from . import criterion
-from . import data_builder
-from . import dataset
-from . import exceptions
-from . import experiment
-from . import loader
-from . import metric
-from . import model
-from . import optimizer
-from . import registry
-from . import writer
-from . import transform
-from . import search
-from . import parameter
-from . import nn
-from . import proc
+import importlib
+
+# submodules are imported on first access, such that 'import lighter' does not import torch
+__all__ = ['checkpoint', 'collectible', 'config', 'context', 'criterion', 'data_builder', 'dataset', 'exceptions',
+           'experiment', 'loader', 'metric', 'model', 'optimizer', 'profiler', 'registry', 'scope', 'writer',
+           'transform', 'search', 'parameter', 'nn', 'proc']
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module('.{}'.format(name), __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals().keys()) | set(__all__))
@@ -1,3 +1,4 @@
+from . import checkpoint as checkpoint
 from . import collectible as collectible
 from . import config as config
 from . import context as context
@@ -10,7 +11,9 @@ from . import loader as loader
 from . import metric as metric
 from . import model as model
 from . import optimizer as optimizer
+from . import profiler as profiler
 from . import registry as registry
+from . import scope as scope
 from . import writer as writer
 from . import transform as transform
 from . import search as search
@@ -0,0 +1,388 @@
+import os
+import re
+import json
+import pickle
+import shutil
+import logging
+import numpy as np
+import torch
+from collections import OrderedDict
+from threading import Thread
+from lighter.collectible import BaseCollectible
+
+
+def snapshot(obj):
+    """
+    Recursively copies the tensors of a (state) dictionary to host memory.
+    Device tensors are copied asynchronously into pinned memory and synchronized once.
+    :param obj: state object
+    :return: copy of the state object with host tensors
+    """
+    def _copy(value):
+        if torch.is_tensor(value):
+            value = value.detach()
+            if value.is_cuda:
+                copy = torch.empty(value.size(), dtype=value.dtype, pin_memory=True)
+                return copy.copy_(value, non_blocking=True)
+            return value.clone()
+        if isinstance(value, dict):
+            return value.__class__((k, _copy(v)) for k, v in value.items())
+        if isinstance(value, (list, tuple)):
+            return value.__class__(_copy(v) for v in value)
+        return value
+    obj = _copy(obj)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return obj
+
+
+def save_checkpoint(obj, path: str):
+    """
+    Saves a checkpoint atomically by writing and syncing a temporary file before renaming it.
+    :param obj: checkpoint object
+    :param path: checkpoint file path
+    :return:
+    """
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'wb') as file:
+        torch.save(obj, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class _TensorRef(object):
+    """
+    Placeholder of a tensor within the pickled structure of a sharded checkpoint.
+    """
+    def __init__(self, name: str):
+        self.name = name
+
+
+def _is_metadata(value) -> bool:
+    # only values surviving a JSON round trip unchanged are stored in the manifest
+    try:
+        return json.loads(json.dumps(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+
+def save_sharded_checkpoint(obj: dict, path: str, alignment: int = 64):
+    """
+    Saves a checkpoint dictionary as a directory with a JSON manifest and one raw tensor shard per entry.
+    JSON serializable entries (e.g. epoch, metrics) are stored in the manifest, all other entries are stored as
+    a small pickled structure referencing tensors in a memory-mappable binary file.
+    The directory is written to a temporary location and renamed atomically.
+    :param obj: checkpoint dictionary
+    :param path: checkpoint directory path
+    :param alignment: byte alignment of the tensors within the shard files
+    :return:
+    """
+    tmp_path = '{}.tmp'.format(path)
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    manifest = {'format': 'lighter-sharded', 'version': 1, 'metadata': {}, 'shards': {}}
+    for key, value in obj.items():
+        if _is_metadata(value):
+            manifest['metadata'][key] = value
+            continue
+        tensors = OrderedDict()
+
+        def _extract(item, name):
+            if torch.is_tensor(item):
+                tensors[name] = item
+                return _TensorRef(name)
+            if isinstance(item, dict):
+                return item.__class__((k, _extract(v, '{}/{}'.format(name, k) if name else str(k)))
+                                      for k, v in item.items())
+            if isinstance(item, (list, tuple)):
+                return item.__class__(_extract(v, '{}/{}'.format(name, i) if name else str(i))
+                                      for i, v in enumerate(item))
+            return item
+        structure = _extract(value, '')
+        entries = {}
+        with open(os.path.join(tmp_path, '{}.bin'.format(key)), 'wb') as file:
+            offset = 0
+            for name, tensor in tensors.items():
+                data = tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy()
+                padding = -offset % alignment
+                file.write(b'\0' * padding)
+                offset += padding
+                file.write(data.tobytes())
+                entries[name] = {'offset': offset, 'nbytes': int(data.nbytes),
+                                 'dtype': str(tensor.dtype).split('.')[-1], 'shape': list(tensor.shape)}
+                offset += data.nbytes
+            file.flush()
+            os.fsync(file.fileno())
+        with open(os.path.join(tmp_path, '{}.pkl'.format(key)), 'wb') as file:
+            pickle.dump(structure, file)
+        manifest['shards'][key] = {'data': '{}.bin'.format(key), 'structure': '{}.pkl'.format(key),
+                                   'tensors': entries}
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w') as file:
+        file.write(json.dumps(manifest, indent=2))
+        file.flush()
+        os.fsync(file.fileno())
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+class ShardedCheckpoint(object):
+    """
+    Lazy reader of a sharded checkpoint directory. The metadata is read from the manifest only and
+    tensors are memory-mapped individually on access without copying.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as file:
+            self.manifest = json.load(file)
+
+    @property
+    def metadata(self) -> dict:
+        return self.manifest['metadata']
+
+    @property
+    def shards(self) -> list:
+        return list(self.manifest['shards'].keys())
+
+    def names(self, shard: str) -> list:
+        """
+        Returns the tensor names of a shard.
+        :param shard: name of the checkpoint entry, e.g. 'model_state_dict'
+        :return: list of tensor names
+        """
+        return list(self.manifest['shards'][shard]['tensors'].keys())
+
+    def tensor(self, shard: str, name: str, map_location=None):
+        """
+        Memory-maps a single tensor of a shard.
+        :param shard: name of the checkpoint entry, e.g. 'model_state_dict'
+        :param name: tensor name within the shard
+        :param map_location: optional device to move the tensor to
+        :return: tensor backed by the checkpoint file if no map_location is given
+        """
+        info = self.manifest['shards'][shard]
+        entry = info['tensors'][name]
+        dtype = getattr(torch, entry['dtype'])
+        if entry['nbytes'] == 0:
+            tensor = torch.empty(entry['shape'], dtype=dtype)
+        else:
+            data = np.memmap(os.path.join(self.path, info['data']), dtype=np.uint8, mode='c',
+                             offset=entry['offset'], shape=(entry['nbytes'],))
+            tensor = torch.from_numpy(data).view(dtype).reshape(entry['shape'])
+        if map_location is not None:
+            tensor = tensor.to(map_location)
+        return tensor
+
+    def load_shard(self, shard: str, prefix: str = None, map_location=None):
+        """
+        Loads a checkpoint entry with memory-mapped tensors.
+        :param shard: name of the checkpoint entry, e.g. 'model_state_dict'
+        :param prefix: only keeps the top-level keys starting with the prefix if specified
+        :param map_location: optional device to move the tensors to
+        :return: checkpoint entry
+        """
+        with open(os.path.join(self.path, self.manifest['shards'][shard]['structure']), 'rb') as file:
+            structure = pickle.load(file)
+        if prefix is not None and isinstance(structure, dict):
+            structure = structure.__class__((k, v) for k, v in structure.items() if str(k).startswith(prefix))
+
+        def _resolve(item):
+            if isinstance(item, _TensorRef):
+                return self.tensor(shard, item.name, map_location=map_location)
+            if isinstance(item, dict):
+                return item.__class__((k, _resolve(v)) for k, v in item.items())
+            if isinstance(item, (list, tuple)):
+                return item.__class__(_resolve(v) for v in item)
+            return item
+        return _resolve(structure)
+
+    def load(self, map_location=None) -> dict:
+        """
+        Loads the full checkpoint dictionary.
+        :param map_location: optional device to move the tensors to
+        :return: checkpoint dictionary
+        """
+        obj = dict(self.metadata)
+        for shard in self.shards:
+            obj[shard] = self.load_shard(shard, map_location=map_location)
+        return obj
+
+
+def load_checkpoint(path: str, map_location=None) -> dict:
+    """
+    Loads a checkpoint saved with save_checkpoint or save_sharded_checkpoint.
+    :param path: checkpoint file or directory path
+    :param map_location: device to load the tensors to
+    :return: checkpoint dictionary
+    """
+    if os.path.isdir(path):
+        return ShardedCheckpoint(path).load(map_location=map_location)
+    return torch.load(path, map_location=map_location)
+
+
+class AsyncCheckpointer(object):
+    """
+    Saves checkpoints on a background thread after taking a host memory snapshot on the calling thread.
+    At most one checkpoint is in flight, a new submit waits for the previous one to complete.
+    """
+    def __init__(self, save=save_checkpoint):
+        self.save = save
+        self.thread = None
+        self.error = None
+
+    def _run(self, obj, path: str, callback):
+        try:
+            self.save(obj, path)
+            if callback is not None:
+                callback()
+        except Exception as e:
+            logging.exception('AsyncCheckpointer: Could not save checkpoint: {}'.format(path))
+            self.error = e
+
+    def submit(self, obj, path: str, callback=None):
+        """
+        Snapshots the checkpoint object and saves it asynchronously.
+        :param obj: checkpoint object
+        :param path: checkpoint file path
+        :param callback: optional function called on the background thread after the checkpoint was saved
+        :return:
+        """
+        self.wait()
+        obj = snapshot(obj)
+        self.thread = Thread(target=self._run, args=(obj, path, callback), name='lighter-checkpoint')
+        self.thread.start()
+
+    def wait(self):
+        """
+        Waits for the checkpoint in flight and raises its error if saving failed.
+        :return:
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+
+class CheckpointManager(object):
+    """
+    Keeps an index file of the checkpoints within a directory and applies a keep-last-N / keep-best-N
+    retention policy. The latest and best checkpoints are found from the index without loading any checkpoint.
+    """
+    INDEX_FILE = 'checkpoints.index.json'
+    FILE_PATTERN = re.compile(r'^e-(\d+)_time-.*\.ckpt$')
+
+    def __init__(self,
+                 path: str,
+                 keep_last: int = None,
+                 keep_best: int = None,
+                 metric: str = None,
+                 mode: str = 'max'):
+        """
+        :param path: checkpoint directory
+        :param keep_last: number of most recent checkpoints to keep, None keeps all or only the latest with keep_best
+        :param keep_best: number of best checkpoints according to the metric to keep in addition to the last ones
+        :param metric: metric used for ranking, either a collectible key or 'category/name'
+        :param mode: 'max' or 'min' to define if higher or lower metric values are better
+        """
+        if mode not in ['max', 'min']:
+            raise ValueError('CheckpointManager: Unsupported mode: {}'.format(mode))
+        if keep_best is not None and metric is None:
+            raise ValueError('CheckpointManager: keep_best requires a metric!')
+        self.path = path
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.metric = metric
+        if metric is not None and '/' in metric:
+            category, name = metric.split('/', 1)
+            self.metric = BaseCollectible.key(name, category)
+        self.mode = mode
+        self.index_file = os.path.join(path, CheckpointManager.INDEX_FILE)
+        self.entries = self._load()
+
+    def _load(self) -> list:
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as file:
+                return json.load(file)
+        # fall back to the file names of checkpoints written without an index
+        entries = []
+        if os.path.isdir(self.path):
+            for file in sorted(os.listdir(self.path)):
+                match = CheckpointManager.FILE_PATTERN.match(file)
+                if match is not None:
+                    entries.append({'file': file, 'epoch': int(match.group(1)), 'metrics': {}})
+            entries.sort(key=lambda e: e['epoch'])
+        return entries
+
+    def _save(self):
+        tmp_file = '{}.tmp'.format(self.index_file)
+        with open(tmp_file, 'w') as file:
+            file.write(json.dumps(self.entries, indent=2))
+        os.replace(tmp_file, self.index_file)
+
+    def _value(self, entry):
+        value = entry['metrics'].get(self.metric)
+        if value is None:
+            return None
+        return value if self.mode == 'max' else -value
+
+    def register(self, file: str, epoch: int, metrics: dict = None):
+        """
+        Adds a saved checkpoint to the index and applies the retention policy.
+        :param file: checkpoint file path
+        :param epoch: checkpoint epoch
+        :param metrics: metrics stored in the checkpoint
+        :return:
+        """
+        metrics = {} if metrics is None else {k: float(v) for k, v in metrics.items()}
+        self.entries.append({'file': os.path.basename(file), 'epoch': epoch, 'metrics': metrics})
+        self.prune()
+        self._save()
+
+    def prune(self):
+        """
+        Removes all checkpoints which are neither within the last nor the best checkpoints.
+        Without any limit all checkpoints are kept, with keep_best only the latest checkpoint is kept
+        in addition to the best ones, such that resuming continues from it.
+        :return:
+        """
+        if self.keep_last is None and self.keep_best is None:
+            return
+        keep_last = 1 if self.keep_last is None else self.keep_last
+        keep = set(e['file'] for e in self.entries[-keep_last:] if keep_last > 0)
+        if self.keep_best is not None:
+            ranked = [e for e in self.entries if self._value(e) is not None]
+            ranked.sort(key=self._value, reverse=True)
+            keep.update(e['file'] for e in ranked[:self.keep_best])
+        for entry in [e for e in self.entries if e['file'] not in keep]:
+            file = os.path.join(self.path, entry['file'])
+            if os.path.isdir(file):
+                shutil.rmtree(file)
+            elif os.path.exists(file):
+                os.remove(file)
+        self.entries = [e for e in self.entries if e['file'] in keep]
+
+    def latest(self) -> str:
+        """
+        Returns the path of the most recent existing checkpoint or None.
+        """
+        for entry in reversed(self.entries):
+            file = os.path.join(self.path, entry['file'])
+            if os.path.exists(file):
+                return file
+        return None
+
+    def best(self) -> str:
+        """
+        Returns the path of the best existing checkpoint according to the metric or None.
+        """
+        if self.metric is None:
+            raise ValueError('CheckpointManager: No metric defined to determine the best checkpoint!')
+        ranked = [e for e in self.entries if self._value(e) is not None
+                  and os.path.exists(os.path.join(self.path, e['file']))]
+        if len(ranked) == 0:
+            return None
+        return os.path.join(self.path, max(ranked, key=self._value)['file'])
@@ -1,4 +1,5 @@
 import numpy as np
+import torch
 from box import Box
 from lighter.decorator import context
 
@@ -8,10 +9,44 @@ class BaseCollectible(object):
     Base class for collectibles. They are used to store and update values over multiple steps / epochs.
     Collectibles are passed a dictionary containing key-value pairs whereas the key
     determines the collection for adding values.
+    Reductions are cached per key and only recomputed for keys updated since the last call.
     """
     @context
     def __init__(self):
         self.collection = Box()
+        self.cache = {}
+        self.emas = {}
+
+    @staticmethod
+    def key(name: str, category: str = None) -> str:
+        """
+        Returns the collection key of a value name within a category.
+        :param name: name of the value
+        :param category: group category of the value
+        :return: collection key
+        """
+        if category is None:
+            return name
+        return '${}$_{}'.format(category, name)
+
+    def keys(self, category: str = None) -> list:
+        """
+        Returns the collection keys, optionally restricted to a category.
+        :param category: group category of the keys
+        :return: list of collection keys
+        """
+        if category is None:
+            return list(self.collection.keys())
+        prefix = '${}$_'.format(category)
+        return [key for key in self.collection.keys() if key.startswith(prefix)]
+
+    def history(self, key: str):
+        """
+        Returns the stored values of a collection key.
+        :param key: collection key
+        :return: list of values
+        """
+        return self.collection[key]
 
     def reset(self):
         """
@@ -19,6 +54,8 @@ class BaseCollectible(object):
         :return:
         """
         self.collection = Box()
+        self.cache = {}
+        self.emas = {}
 
     def update(self, category: str = None, **kwargs):
         """
@@ -32,19 +69,212 @@ class BaseCollectible(object):
         :return:
         """
         for key, value in kwargs.items():
-            if category is not None:
-                key = '${}$_{}'.format(category, key)
+            key = self.key(key, category)
             if key not in self.collection.keys():
                 self.collection[key] = []
             self.collection[key].append(value)
+            # invalidate cached reductions of the key
+            self.cache.pop(key, None)
 
-    def redux(self, func=np.mean):
+    def redux(self, func=np.mean, category: str = None, window: int = None):
         """
         Reduces the collected values to a single number.
         :param func: Reduction function applied on the collected values.
+        :param category: Only reduces the keys of the category if specified.
+        :param window: Only reduces the last window values per key if specified.
+        :return: Dictionary with reduced single numbers per key.
+        """
+        redux = {}
+        for key in self.keys(category):
+            cache = self.cache.setdefault(key, {})
+            if (func, window) not in cache:
+                value = self.collection[key]
+                if window is not None:
+                    value = value[-window:]
+                cache[(func, window)] = func(np.array(value))
+            redux[key] = cache[(func, window)]
+        return redux
+
+    def ema(self, alpha: float = 0.9, category: str = None):
+        """
+        Exponential moving average of the collected values. Only values added since the last call are processed.
+        :param alpha: Smoothing factor weighting the previous average.
+        :param category: Only reduces the keys of the category if specified.
+        :return: Dictionary with the moving averages per key.
+        """
+        redux = {}
+        for key in self.keys(category):
+            values = self.history(key)
+            n, average = self.emas.get((key, alpha), (0, None))
+            for value in values[n:]:
+                average = value if average is None else alpha * average + (1 - alpha) * value
+            self.emas[(key, alpha)] = (len(values), average)
+            redux[key] = average
+        return redux
+
+
+class StreamingCollectible(BaseCollectible):
+    """
+    Collectible keeping a running sum and count per key instead of the value history.
+    Tensor values stay on their device and are only moved to the host once when calling redux,
+    which avoids a device synchronization per step. Only mean reductions are supported.
+    """
+    @context
+    def __init__(self):
+        super(StreamingCollectible, self).__init__()
+        self.counts = {}
+
+    def reset(self):
+        super(StreamingCollectible, self).reset()
+        self.counts = {}
+
+    def update(self, category: str = None, **kwargs):
+        """
+        Adds scalar values (numbers or single element tensors) to the running sums.
+        :param category: defines a group category for the values
+        :param kwargs: key-value data pair.
+        :return:
+        """
+        for key, value in kwargs.items():
+            key = self.key(key, category)
+            if torch.is_tensor(value):
+                value = value.detach()
+            if key in self.counts:
+                self.collection[key] = self.collection[key] + value
+                self.counts[key] += 1
+            else:
+                self.collection[key] = value
+                self.counts[key] = 1
+            self.cache.pop(key, None)
+
+    def redux(self, func=np.mean, category: str = None, window: int = None):
+        """
+        Reduces the running sums to their means with a single host synchronization for all updated keys.
+        :param func: Reduction function, only np.mean is supported.
+        :param category: Only reduces the keys of the category if specified.
+        :param window: Not supported, since no value history is kept.
+        :return: Dictionary with reduced single numbers per key.
+        """
+        if func is not np.mean or window is not None:
+            raise ValueError('StreamingCollectible: Only np.mean reductions without windows are supported!')
+        keys = self.keys(category)
+        missing = [k for k in keys if k not in self.cache]
+        if len(missing) > 0:
+            device = next((v.device for v in self.collection.values() if torch.is_tensor(v)), 'cpu')
+            sums = torch.stack([torch.as_tensor(self.collection[k], dtype=torch.float32, device=device).reshape(())
+                                for k in missing]).cpu().tolist()
+            for k, s in zip(missing, sums):
+                self.cache[k] = s / self.counts[k]
+        return {k: self.cache[k] for k in keys}
+
+    def history(self, key: str):
+        raise ValueError('StreamingCollectible: No value history available!')
+
+
+class ArrayCollectible(BaseCollectible):
+    """
+    Collectible interning category/key pairs once and keeping running reductions (mean, sum, min, max, count)
+    in numeric arrays. Raw value histories are only stored in growable typed buffers if keep_history is enabled.
+    """
+    # reductions answered from the running statistics without a value history
+    RUNNING_REDUCTIONS = {np.mean: 'mean', np.sum: 'sum', np.min: 'min', np.max: 'max', len: 'count'}
+
+    @context
+    def __init__(self, keep_history: bool = False, dtype=np.float64, capacity: int = 1024):
+        self.keep_history = keep_history
+        self.dtype = dtype
+        self.capacity = capacity
+        super(ArrayCollectible, self).__init__()
+        self.reset()
+
+    def reset(self):
+        super(ArrayCollectible, self).reset()
+        self.index = {}
+        self.names = []
+        self.count = np.zeros(0, dtype=np.int64)
+        self.sum = np.zeros(0, dtype=np.float64)
+        self.min = np.zeros(0, dtype=np.float64)
+        self.max = np.zeros(0, dtype=np.float64)
+        self.buffers = []
+
+    def _intern(self, category: str, name: str) -> int:
+        """
+        Registers a new category/key pair and grows the statistic arrays.
+        :param category: group category of the value
+        :param name: name of the value
+        :return: index of the pair
+        """
+        idx = len(self.names)
+        self.index[(category, name)] = idx
+        self.names.append(self.key(name, category))
+        self.count = np.append(self.count, 0)
+        self.sum = np.append(self.sum, 0.0)
+        self.min = np.append(self.min, np.inf)
+        self.max = np.append(self.max, -np.inf)
+        if self.keep_history:
+            self.buffers.append(np.empty(self.capacity, dtype=self.dtype))
+        return idx
+
+    def update(self, category: str = None, **kwargs):
+        for name, value in kwargs.items():
+            idx = self.index.get((category, name))
+            if idx is None:
+                idx = self._intern(category, name)
+            value = float(value)
+            n = self.count[idx]
+            self.count[idx] = n + 1
+            self.sum[idx] += value
+            if value < self.min[idx]:
+                self.min[idx] = value
+            if value > self.max[idx]:
+                self.max[idx] = value
+            if self.keep_history:
+                buffer = self.buffers[idx]
+                if n >= len(buffer):
+                    buffer = np.resize(buffer, max(1, 2 * len(buffer)))
+                    self.buffers[idx] = buffer
+                buffer[n] = value
+
+    def history(self, key: str) -> np.ndarray:
+        """
+        Returns the stored values of a collection key.
+        :param key: collection key
+        :return: view on the value buffer
+        """
+        if not self.keep_history:
+            raise ValueError('ArrayCollectible: No value history available, enable keep_history!')
+        idx = self.names.index(key)
+        return self.buffers[idx][:self.count[idx]]
+
+    def keys(self, category: str = None) -> list:
+        if category is None:
+            return list(self.names)
+        return [self.names[idx] for (cat, _), idx in self.index.items() if cat == category]
+
+    def redux(self, func=np.mean, category: str = None, window: int = None):
+        """
+        Reduces the collected values to a single number. Running reductions are computed in O(1) per key,
+        any other function or a window requires keep_history to be enabled.
+        :param func: Reduction function applied on the collected values.
+        :param category: Only reduces the keys of the category if specified.
+        :param window: Only reduces the last window values per key if specified.
         :return: Dictionary with reduced single numbers per key.
         """
+        reduction = self.RUNNING_REDUCTIONS.get(func) if window is None else None
+        if reduction is None and not self.keep_history:
+            raise ValueError('ArrayCollectible: Reduction {} requires keep_history!'.format(func))
+        if category is None:
+            indices = range(len(self.names))
+        else:
+            indices = [idx for (cat, _), idx in self.index.items() if cat == category]
         redux = {}
-        for key, value in self.collection.items():
-            redux[key] = func(np.array(value))
+        for idx in indices:
+            if reduction == 'mean':
+                value = self.sum[idx] / max(self.count[idx], 1)
+            elif reduction is not None:
+                value = getattr(self, reduction)[idx]
+            else:
+                start = 0 if window is None else max(self.count[idx] - window, 0)
+                value = func(self.buffers[idx][start:self.count[idx]])
+            redux[self.names[idx]] = value.item() if isinstance(value, np.generic) else value
         return redux
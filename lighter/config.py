@@ -1,16 +1,130 @@
+import copy
 import json
 import os
 import argparse
+import threading
 from threading import RLock
 import logging
-import torch
 from box import Box
 from lighter.exceptions import InvalidTypeReferenceError
 from lighter.loader import Loader
 from lighter.misc import extract_named_args, try_to_number_or_bool, DotDict
+from lighter.profiler import Profiler
+from lighter import scope
 from lighter.registry import Registry
 
 
+# stack of the config cache entries currently loading in this thread
+_loading = threading.local()
+
+
+def _register_type(name, type_):
+    Registry.get_instance().register_type(name, type_)
+    # record the registration for all config files currently loading to replay it on cache hits
+    for entry in getattr(_loading, 'entries', []):
+        entry['types'].append((name, type_))
+
+
+def _copy_tree(value):
+    """
+    Copies the dictionaries and lists of a config tree and shares all immutable leaves.
+    """
+    if isinstance(value, dict):
+        node = Box()
+        for k, v in dict.items(value):
+            dict.__setitem__(node, k, _copy_tree(v))
+        return node
+    if isinstance(value, list):
+        return [_copy_tree(v) for v in value]
+    return value
+
+
+class ConfigCache(object):
+    """
+    Process-wide cache of parsed and imported config files keyed by absolute path, modification time and size.
+    Every load returns a fresh copy of the cached tree, such that modifications never leak into the cache.
+    Types registered while importing a file are registered again on cache hits, and files referenced with
+    'config::' or 'import::' are validated as well.
+    """
+    _instance = None
+    _mutex = RLock()
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stamp(path: str):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _valid(self, entry: dict) -> bool:
+        try:
+            return all(self._stamp(path) == stamp for path, stamp in entry['files'])
+        except OSError:
+            return False
+
+    def load(self, path: str) -> Box:
+        """
+        Returns the imported config tree of a json file.
+        :param path: path to the json file
+        :return: new Box tree of the config
+        """
+        path = os.path.abspath(path)
+        with Profiler.get_instance().record('config', path):
+            return self._load(path)
+
+    def _load(self, path: str) -> Box:
+        with ConfigCache._mutex:
+            entry = self.entries.get(path)
+            if entry is not None and self._valid(entry):
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+        if entry is not None:
+            for name, type_ in entry['types']:
+                _register_type(name, type_)
+        else:
+            entry = {'files': [(path, self._stamp(path))], 'types': [], 'tree': None}
+            if not hasattr(_loading, 'entries'):
+                _loading.entries = []
+            _loading.entries.append(entry)
+            try:
+                tree = Config()
+                with open(path) as f:
+                    tree.initialize_from_json(json.loads(f.read()).items())
+                entry['tree'] = tree
+            finally:
+                _loading.entries.pop()
+            with ConfigCache._mutex:
+                self.entries[path] = entry
+        # referenced files are dependencies of all files currently loading
+        for parent in getattr(_loading, 'entries', []):
+            parent['files'].extend(entry['files'])
+        return _copy_tree(entry['tree'])
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries)}
+
+    def clear(self):
+        with ConfigCache._mutex:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @staticmethod
+    def get_instance() -> "ConfigCache":
+        ConfigCache._mutex.acquire()
+        try:
+            if ConfigCache._instance is None:
+                ConfigCache._instance = ConfigCache()
+            return ConfigCache._instance
+        finally:
+            ConfigCache._mutex.release()
+
+
 def import_value_rec(name, value):
     """
     Imports configs or classes to the current config instance.
@@ -26,7 +140,7 @@ def import_value_rec(name, value):
                 raise InvalidTypeReferenceError('Config: Could not find specified reference: {}'.format(value))
 
             # register type to registry
-            Registry.get_instance().register_type(name, type_)
+            _register_type(name, type_)
 
         except ModuleNotFoundError as e:
             logging.warning("Error while importing '{}' - {}".format(value, e))
@@ -100,8 +214,8 @@ class Config(Box):
             if isinstance(path, str):
                 if not os.path.exists(path):
                     raise FileNotFoundError('Invalid config path! Could not resolve: {}'.format(path))
-                with open(path) as f:
-                    self.initialize_from_json(json.loads(f.read()).items())
+                for k, v in dict.items(ConfigCache.get_instance().load(path)):
+                    self[k] = v
                 # override if necessary
                 if override_args is not None:
                     self.override_from_commandline(override_args)
@@ -111,21 +225,69 @@ class Config(Box):
                 raise TypeError('Unsupported data after initialization!', path)
 
     def copy(self) -> "Config":
+        """
+        Creates a structural copy which shares the top-level properties with this config.
+        Shared nested properties are copied on write: the first access of a shared property copies it, such that
+        attribute assignments of either config do not affect the other one. Nested properties updated with
+        set_value or copy_path are copied along the changed path as well. Therefore, copies and updates scale
+        with the changed properties and not with the config size.
+        """
         config = Config()
-        dict_ = super().copy()
-        config.initialize_from_dict(dict_)
+        for k, v in dict.items(self):
+            dict.__setitem__(config, k, v)
+        shared = {k for k, v in dict.items(self) if isinstance(v, (dict, list))}
+        self._shared().update(shared)
+        config._shared().update(shared)
         return config
 
+    def _shared(self) -> set:
+        return self._box_config.setdefault('__lighter_shared', set())
+
+    def __getitem__(self, item, _ignore_default=False):
+        shared = self._box_config.get('__lighter_shared')
+        if shared and item in shared:
+            shared.discard(item)
+            value = dict.get(self, item)
+            if isinstance(value, (dict, list)):
+                dict.__setitem__(self, item, copy.deepcopy(value))
+                self._box_config['__converted'].discard(item)
+        return super(Config, self).__getitem__(item, _ignore_default=_ignore_default)
+
+    def __setitem__(self, key, value):
+        shared = self._box_config.get('__lighter_shared')
+        if shared:
+            shared.discard(key)
+        super(Config, self).__setitem__(key, value)
+
     def save(self, file_name):
         dict_str = json.dumps(self, indent=2)
         with open(file_name, 'w') as file:
             file.write(dict_str)
 
+    def _copy_groups(self, groups) -> Box:
+        node = self
+        for group in groups:
+            child = node.get(group)
+            copy = Box()
+            if isinstance(child, dict):
+                for k, v in dict.items(child):
+                    dict.__setitem__(copy, k, v)
+            node[group] = copy
+            node = copy
+        return node
+
+    def copy_path(self, name: str) -> Box:
+        """Copies the nodes along a dot-separated reference and returns the last node, which can be modified
+        without affecting other configs sharing the same properties.
+        """
+        return self._copy_groups(DotDict.split(name))
+
     def set_value(self, name, value):
         """Sets the properties recursively according to a dot-separated reference.
         """
-        parent, name = DotDict.resolve(self, name)
-        override(parent, name, value)
+        groups = DotDict.split(name)
+        parent = self._copy_groups(groups[:-1])
+        override(parent, groups[-1], value)
 
     def has_value(self, name):
         """Checks properties recursively according to a dot-separated reference.
@@ -200,25 +362,29 @@ class Config(Box):
         :param device: training device
         :return:
         """
+        # torch is only required to detect the default device
+        import torch
         if config_dict is None:
             config_dict = {}
-        Config._mutex.acquire()
+        mutex = scope.get_mutex(Config)
+        mutex.acquire()
         try:
-            Config._instance, args = Config.load(path=config_file,
-                                                 parse_args_override=parse_args_override,
-                                                 **config_dict)
+            config, args = Config.load(path=config_file,
+                                       parse_args_override=parse_args_override,
+                                       **config_dict)
+            scope.set_instance(Config, config)
             # load default device
             if args is not None and args.device is not None:
-                Config._instance.set_value('device.default', args.device)
+                config.set_value('device.default', args.device)
             elif device is not None:
-                Config._instance.set_value('device.default', device)
+                config.set_value('device.default', device)
             elif torch.cuda.is_available():
-                Config._instance.set_value('device.default', 'cuda')
+                config.set_value('device.default', 'cuda')
             else:
-                Config._instance.set_value('device.default', 'cpu')
-            return Config._instance
+                config.set_value('device.default', 'cpu')
+            return config
         finally:
-            Config._mutex.release()
+            mutex.release()
 
     @staticmethod
     def get_instance() -> "Config":
@@ -226,11 +392,7 @@ class Config(Box):
         Return default config instance.
         :return:
         """
-        Config._mutex.acquire()
-        try:
-            return Config._instance
-        finally:
-            Config._mutex.release()
+        return scope.get_instance(Config)
 
     @staticmethod
     def load(path: str = None, parse_args_override: bool = False, **kwargs):
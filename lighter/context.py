@@ -1,4 +1,10 @@
+import contextlib
+import heapq
+import inspect
+import time
 import traceback
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from threading import RLock
 
 import logging
@@ -6,10 +12,10 @@ import logging
 from lighter.config import Config
 from lighter.exceptions import TypeInstantiationError
 from lighter.misc import generate_short_id
+from lighter.profiler import Profiler
 from lighter.registry import Registry
 from lighter.search import ParameterSearch
-
-import numpy as np
+from lighter import scope
 
 # TODO: remove in future terms
 import warnings
@@ -30,12 +36,17 @@ class Context(object):
                  parse_args_override,
                  device: str = None,
                  auto_instantiate_types: bool = True,
-                 allow_context_changes: bool = True):
+                 allow_context_changes: bool = True,
+                 instantiation_workers: int = 1,
+                 lazy_instantiation: bool = False):
         """
         Create a context object and registers configs, types and instances of the defined modules.
         :param config_file: default config file
+        :param instantiation_workers: number of threads constructing independent types in parallel
+        :param lazy_instantiation: registers proxies which construct the instances on first access
         """
-        Context._mutex.acquire()
+        mutex = scope.get_mutex(Context)
+        mutex.acquire()
         try:
             self.registry = Registry.create_instance()
             self.config = Config.create_instance(config_file,
@@ -46,64 +57,232 @@ class Context(object):
             self.search = ParameterSearch.create_instance()
             self.allow_context_changes = allow_context_changes
             self.auto_instantiate_types = auto_instantiate_types
+            self.instantiation_workers = instantiation_workers
+            self.lazy_instantiation = lazy_instantiation
             if auto_instantiate_types:
                 # if auto instantiation of types is enables, and no context is available this requires to assign
                 # the current instance to the global instance
-                if Context._instance is None:
-                    Context._instance = self
+                if Context.get_instance() is None:
+                    scope.set_instance(Context, self)
                 self.instantiate_types()
         finally:
-            Context._mutex.release()
+            mutex.release()
 
-    def _resolve_dependency_graph(self, types: dict, num_retries: int = 0, max_retries: int = np.inf, error=[]):
+    @staticmethod
+    def dependencies(type_, optional: bool = False) -> set:
         """
-        Registers instances with retries if graph resolving fails due to transitive dependencies between
-        modules.
-        TODO: improve by different prioritization technique
+        Collects the registry instance names a type depends on. The names are declared by the injection
+        decorators of all constructors within the method resolution order.
+        :param type_: type to inspect
+        :param optional: includes the optional dependencies, which may be injected as None
+        :return: set of instance names
+        """
+        attributes = ['__lighter_dependencies__']
+        if optional:
+            attributes.append('__lighter_optional_dependencies__')
+        functions = [type_]
+        if inspect.isclass(type_):
+            functions = [class_.__dict__.get('__init__') for class_ in inspect.getmro(type_)]
+        dependencies = set()
+        for function in functions:
+            for attribute in attributes:
+                dependencies |= getattr(function, attribute, frozenset())
+        return dependencies
+
+    @staticmethod
+    def _construct(name, class_):
+        start = time.perf_counter()
+        try:
+            with Profiler.get_instance().record('instantiate', name):
+                instance = class_()
+            return instance, None, time.perf_counter() - start
+        except Exception:
+            return None, traceback.format_exc(), time.perf_counter() - start
+
+    @staticmethod
+    def _find_cycle(graph: dict):
+        """
+        Returns the first dependency cycle of a graph mapping names to their dependencies.
+        """
+        visited, stack = set(), []
+
+        def visit(name):
+            if name in stack:
+                return stack[stack.index(name):] + [name]
+            if name in visited:
+                return None
+            visited.add(name)
+            stack.append(name)
+            for dependency in sorted(graph[name]):
+                cycle = visit(dependency)
+                if cycle is not None:
+                    return cycle
+            stack.pop()
+            return None
+
+        for node in graph:
+            cycle = visit(node)
+            if cycle is not None:
+                return cycle
+        return None
+
+    def _resolve_dependency_graph(self, types: dict, max_workers: int = 1):
+        """
+        Instantiates and registers the types in topological order of their declared dependencies.
+        Every type is constructed exactly once, ties are broken by the config order and independent types
+        are constructed in parallel if more than one worker is specified. Cycles which contain an optional
+        dependency are broken in config order, such that the first type of the cycle gets None injected.
         :param types: types to instantiate
-        :param num_retries: current retry count
-        :param max_retries: maximum recursion depth
+        :param max_workers: number of threads to construct independent types
         :return:
         """
-        retry = {}
-        for name, class_ in types.items():
-            try:
-                self.registry.register_instance(name, class_())
-            except Exception:
-                err = traceback.format_exc()
-                error.append(err)
-                retry[name] = class_
-        if len(retry) > 0 and num_retries < max_retries:
-            num_retries += 1
-            self._resolve_dependency_graph(retry, num_retries, max_retries)
-        if num_retries >= max_retries:
-            for e in error:
-                logging.exception(e, exc_info=True)
-            raise TypeInstantiationError('Could not resolve the dependency graph due to type creation errors.')
-
-    def instantiate_types(self, types: dict = None):
+        names = list(types.keys())
+        order = {name: i for i, name in enumerate(names)}
+        # only dependencies between the types to instantiate define the order, others are resolved at call time
+        graph = {name: {d for d in self.dependencies(types[name], optional=True) if d in order and d != name}
+                 for name in names}
+        required = {name: self.dependencies(types[name]) & graph[name] for name in names}
+        dependents = {name: [] for name in names}
+        for name, dependencies in graph.items():
+            for dependency in dependencies:
+                dependents[dependency].append(name)
+        pending = {name: len(dependencies) for name, dependencies in graph.items()}
+        ready = [(order[name], name) for name in names if pending[name] == 0]
+        heapq.heapify(ready)
+        scheduled = set(name for _, name in ready)
+        resolved, errors = set(), {}
+
+        def complete(name, instance, error, seconds):
+            if error is not None:
+                errors[name] = error
+                return
+            self.registry.register_instance(name, instance)
+            self.registry.timings[name] = seconds
+            resolved.add(name)
+            for dependent in dependents[name]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0 and dependent not in scheduled:
+                    scheduled.add(dependent)
+                    heapq.heappush(ready, (order[dependent], dependent))
+
+        executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        running = {}
+        try:
+            while True:
+                while ready or running:
+                    while ready:
+                        _, name = heapq.heappop(ready)
+                        if executor is None:
+                            complete(name, *self._construct(name, types[name]))
+                        else:
+                            # constructors run within the scope of the calling thread
+                            running[executor.submit(contextvars.copy_context().run,
+                                                    self._construct, name, types[name])] = name
+                    if running:
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in sorted(done, key=lambda f: order[running[f]]):
+                            complete(running.pop(future), *future.result())
+                # break a cycle of optional dependencies with the first type whose required ones are resolved
+                candidates = [name for name in names if name not in scheduled and required[name] <= resolved]
+                if len(candidates) == 0:
+                    break
+                scheduled.add(candidates[0])
+                heapq.heappush(ready, (order[candidates[0]], candidates[0]))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        unresolved = {name: required[name] - resolved for name in names if name not in scheduled}
+        if len(errors) == 0 and len(unresolved) == 0:
+            return
+        for name, error in errors.items():
+            logging.error('Could not instantiate type: {}\n{}'.format(name, error))
+        messages = []
+        if len(errors) > 0:
+            messages.append('failed types: {}'.format(', '.join(errors.keys())))
+        cycle = self._find_cycle({name: dependencies & unresolved.keys() for name, dependencies in unresolved.items()})
+        if cycle is not None:
+            messages.append('dependency cycle: {}'.format(' -> '.join(cycle)))
+        blocked = [name for name in unresolved if cycle is None or name not in cycle]
+        if len(blocked) > 0:
+            messages.append('skipped types: {}'.format(', '.join(blocked)))
+        raise TypeInstantiationError('Could not resolve the dependency graph due to type creation errors ({}).'
+                                     .format('; '.join(messages)))
+
+    def instantiate_types(self, types: dict = None, max_workers: int = None, lazy: bool = None):
         """
         Instantiates and registers types to the registry instances.
         :param types: types to instantiate and register
+        :param max_workers: number of threads to construct independent types, defaults to the context setting
+        :param lazy: registers lazy proxies instead of instances, defaults to the context setting
         :return:
         """
-        Context._mutex.acquire()
+        mutex = scope.get_mutex(Context)
+        mutex.acquire()
         if types is None:
             types = self.registry.types
+        if max_workers is None:
+            max_workers = self.instantiation_workers
+        if lazy is None:
+            lazy = self.lazy_instantiation
         try:
-            len_types = len(list(types.keys()))
-            if len_types > 0:
-                self._resolve_dependency_graph(types, 0, max_retries=len_types)
+            if lazy:
+                for name, class_ in types.items():
+                    self.registry.register_lazy_instance(name, class_)
+            elif len(types) > 0:
+                self._resolve_dependency_graph(types, max_workers=max_workers)
         finally:
-            Context._mutex.release()
+            mutex.release()
+
+    def report(self) -> dict:
+        """
+        Reports which registry instances are materialized and how long their construction took.
+        :return: dictionary of instance names to materialization state and construction time in seconds
+        """
+        report = {}
+        for name in self.registry.instances.keys():
+            report[name] = {'materialized': self.registry.is_materialized(name),
+                            'seconds': self.registry.timings.get(name)}
+        materialized = ['{} ({:.3f}s)'.format(name, entry['seconds'] or 0.) for name, entry in report.items()
+                        if entry['materialized']]
+        logging.info('Context: materialized {}/{} instances: {}'.format(len(materialized), len(report),
+                                                                      ', '.join(materialized)))
+        return report
 
     @staticmethod
-    def get_instance() -> "Context":
-        Context._mutex.acquire()
+    @contextlib.contextmanager
+    def scope(config_file: str = None,
+              config_dict: dict = None,
+              parse_args_override: bool = False,
+              device: str = None,
+              auto_instantiate_types: bool = True,
+              allow_context_changes: bool = True,
+              instantiation_workers: int = 1,
+              lazy_instantiation: bool = False):
+        """
+        Creates an isolated context with its own config, registry and search instances within a new scope.
+        All decorators resolve the scoped instances until the block exits, which allows to run independent
+        experiments in threads or asyncio tasks of the same process. Threads started within the block
+        need to run in a copy of the current context, see contextvars.copy_context.
+        The arguments are the same as for Context.create.
+        :return: scoped context
+        """
+        token = scope.push()
         try:
-            return Context._instance
+            yield Context.create(config_file,
+                                 config_dict=config_dict,
+                                 parse_args_override=parse_args_override,
+                                 device=device,
+                                 auto_instantiate_types=auto_instantiate_types,
+                                 allow_context_changes=allow_context_changes,
+                                 instantiation_workers=instantiation_workers,
+                                 lazy_instantiation=lazy_instantiation)
         finally:
-            Context._mutex.release()
+            scope.pop(token)
+
+    @staticmethod
+    def get_instance() -> "Context":
+        return scope.get_instance(Context)
 
     @staticmethod
     def create(config_file: str = None,
@@ -111,7 +290,9 @@ class Context(object):
                parse_args_override: bool = True,
                device: str = None,
                auto_instantiate_types: bool = True,
-               allow_context_changes: bool = True) -> "Context":
+               allow_context_changes: bool = True,
+               instantiation_workers: int = 1,
+               lazy_instantiation: bool = False) -> "Context":
         """
         Create application context threadsafe.
         :param config_file: Initial config file for context to load.
@@ -121,16 +302,21 @@ class Context(object):
         :param device: specifies the running device
         :param allow_context_changes: If this is set to False, it prevents all decorators from modifying updates
                on the configs, context and registry
+        :param instantiation_workers: number of threads constructing independent types in parallel
+        :param lazy_instantiation: registers proxies which construct the instances on first access
         :return:
         """
-        Context._mutex.acquire()
+        mutex = scope.get_mutex(Context)
+        mutex.acquire()
         try:
-            Context._instance = Context(config_file,
-                                        config_dict=config_dict,
-                                        parse_args_override=parse_args_override,
-                                        auto_instantiate_types=auto_instantiate_types,
-                                        device=device,
-                                        allow_context_changes=allow_context_changes)
-            return Context._instance
+            context = Context(config_file,
+                              config_dict=config_dict,
+                              parse_args_override=parse_args_override,
+                              auto_instantiate_types=auto_instantiate_types,
+                              device=device,
+                              allow_context_changes=allow_context_changes,
+                              instantiation_workers=instantiation_workers,
+                              lazy_instantiation=lazy_instantiation)
+            return scope.set_instance(Context, context)
         finally:
-            Context._mutex.release()
+            mutex.release()
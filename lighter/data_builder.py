@@ -1,15 +1,159 @@
-from lighter.decorator import dataset, context
+import threading
+from queue import Queue, Full
+from collections import deque
+import torch
+from lighter.decorator import dataset, context, device
+
+
+def _to_device(batch, device, non_blocking: bool = False):
+    if torch.is_tensor(batch):
+        return batch.to(device, non_blocking=non_blocking)
+    if isinstance(batch, dict):
+        return batch.__class__((k, _to_device(v, device, non_blocking)) for k, v in batch.items())
+    if isinstance(batch, (list, tuple)):
+        return batch.__class__(_to_device(v, device, non_blocking) for v in batch)
+    return batch
+
+
+def _record_stream(batch, stream):
+    if torch.is_tensor(batch):
+        batch.record_stream(stream)
+    elif isinstance(batch, dict):
+        for value in batch.values():
+            _record_stream(value, stream)
+    elif isinstance(batch, (list, tuple)):
+        for value in batch:
+            _record_stream(value, stream)
+
+
+class DevicePrefetcher(object):
+    """
+    Wraps a data loader and moves the upcoming batches to the device while the current batch is processed.
+    On cuda devices the copies are issued on a side stream, otherwise a background thread prefetches the batches.
+    """
+    def __init__(self, loader, device, depth: int = 2):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.depth = max(int(depth), 1)
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __getattr__(self, item):
+        # the loader is not set yet while copying or unpickling
+        if item == 'loader':
+            raise AttributeError(item)
+        return getattr(self.loader, item)
+
+    def __iter__(self):
+        if self.device.type == 'cuda':
+            return self._stream_iter()
+        return self._thread_iter()
+
+    def _stream_iter(self):
+        stream = torch.cuda.Stream(device=self.device)
+        iterator = iter(self.loader)
+        pending = deque()
+
+        def _preload():
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                return False
+            with torch.cuda.stream(stream):
+                pending.append(_to_device(batch, self.device, non_blocking=True))
+            return True
+        while len(pending) < self.depth and _preload():
+            pass
+        while len(pending) > 0:
+            torch.cuda.current_stream(self.device).wait_stream(stream)
+            batch = pending.popleft()
+            # mark the tensors as used by the compute stream to keep the allocator from reusing their memory
+            _record_stream(batch, torch.cuda.current_stream(self.device))
+            _preload()
+            yield batch
+
+    def _thread_iter(self):
+        queue = Queue(maxsize=self.depth)
+        stop = threading.Event()
+        done = object()
+
+        def _put(item):
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def _worker():
+            try:
+                for batch in self.loader:
+                    if not _put(_to_device(batch, self.device)):
+                        return
+                _put(done)
+            except Exception as e:
+                _put(e)
+        thread = threading.Thread(target=_worker, name='lighter-prefetch', daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch = queue.get()
+                if batch is done:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            stop.set()
 
 
 class BaseDataBuilder(object):
     """
     Base class for building the data loaders with injected 'dataset' reference and application 'context'.
+    The optional 'data_builder' config keys 'num_workers', 'pin_memory', 'persistent_workers' and 'prefetch_factor'
+    are returned by loader_options, 'prefetch_to_device' sets the prefetch depth of the device prefetcher.
+    Memory is only pinned for cuda devices, where 'pin_memory' defaults to true.
     """
+    LOADER_OPTIONS = ['num_workers', 'pin_memory', 'persistent_workers', 'prefetch_factor']
+
+    @device
     @dataset
     @context
     def __init__(self):
         pass
 
+    def loader_options(self) -> dict:
+        """
+        Returns the data loader keyword arguments defined in the 'data_builder' config.
+        :return: keyword arguments for torch.utils.data.DataLoader
+        """
+        config = self.config.get('data_builder') or {}
+        options = {k: config[k] for k in BaseDataBuilder.LOADER_OPTIONS if config.get(k) is not None}
+        # pinned memory only speeds up copies to cuda devices
+        if torch.device(self.device).type == 'cuda':
+            options.setdefault('pin_memory', True)
+        else:
+            options.pop('pin_memory', None)
+        # worker options are only valid for multi-process loading
+        if options.get('num_workers', 0) == 0:
+            options.pop('persistent_workers', None)
+            options.pop('prefetch_factor', None)
+        return options
+
+    def prefetch(self, loader):
+        """
+        Wraps a data loader with a device prefetcher if 'prefetch_to_device' is set in the 'data_builder' config.
+        :param loader: data loader
+        :return: prefetching or original data loader
+        """
+        config = self.config.get('data_builder') or {}
+        depth = config.get('prefetch_to_device')
+        if loader is None or not depth:
+            return loader
+        return DevicePrefetcher(loader, self.device, depth=depth)
+
     def loader(self, *args, **kwargs):
         """
         Returns the data loader instances.
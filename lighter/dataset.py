@@ -1,11 +1,146 @@
+import json
+import hashlib
+import weakref
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
 from torch.utils.data import Dataset
 from lighter.decorator import transform
 
 
+class SharedDataCache(object):
+    """
+    Cache of decoded arrays in named shared memory segments, such that the worker processes of a host decode
+    and store every sample only once. A segment is owned by the process which created it and is removed when
+    this process clears the cache or exits, other processes keep their attached copies until they exit.
+    """
+    # the header contains a ready flag followed by the json encoded dtype and shape
+    HEADER_SIZE = 256
+
+    def __init__(self, namespace: str):
+        """
+        :param namespace: identifies the data source, e.g. the path of the meta file
+        """
+        self.namespace = namespace
+        self.segments = {}
+        self.owned = set()
+        self._finalizer = weakref.finalize(self, SharedDataCache._release, self.segments, self.owned)
+
+    def __getstate__(self):
+        # data loader workers attach to the segments by name
+        return {'namespace': self.namespace}
+
+    def __setstate__(self, state):
+        self.__init__(state['namespace'])
+
+    def _name(self, key) -> str:
+        # short names, since some platforms limit the length of shared memory names
+        return 'lt' + hashlib.sha1('{}\0{}'.format(self.namespace, key).encode()).hexdigest()[:24]
+
+    @staticmethod
+    def _attach(name: str) -> shared_memory.SharedMemory:
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13 always tracks attached segments, the tracker would unlink them when the process exits
+            segment = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(segment._name, 'shared_memory')
+            return segment
+
+    @staticmethod
+    def _view(segment: shared_memory.SharedMemory) -> np.ndarray:
+        header = bytes(segment.buf[1:SharedDataCache.HEADER_SIZE]).rstrip(b'\0')
+        meta = json.loads(header.decode())
+        array = np.ndarray(meta['shape'], dtype=meta['dtype'], buffer=segment.buf, offset=SharedDataCache.HEADER_SIZE)
+        array.flags.writeable = False
+        return array
+
+    def get(self, key) -> np.ndarray:
+        """
+        Returns a read-only view of a cached array.
+        :param key: sample key
+        :return: array or None if the key is not cached or still being written
+        """
+        segment = self.segments.get(key)
+        if segment is None:
+            try:
+                segment = self._attach(self._name(key))
+            except FileNotFoundError:
+                return None
+            if segment.buf[0] != 1:
+                segment.close()
+                return None
+            self.segments[key] = segment
+        return self._view(segment)
+
+    def put(self, key, array: np.ndarray) -> np.ndarray:
+        """
+        Stores an array in shared memory, if another process is already storing the key the array is not shared.
+        :param key: sample key
+        :param array: decoded sample
+        :return: read-only view of the shared array or the array itself
+        """
+        array = np.ascontiguousarray(array)
+        header = json.dumps({'dtype': array.dtype.str, 'shape': array.shape}).encode()
+        try:
+            segment = shared_memory.SharedMemory(name=self._name(key), create=True,
+                                                 size=self.HEADER_SIZE + max(array.nbytes, 1))
+        except FileExistsError:
+            return array
+        segment.buf[1:1 + len(header)] = header
+        segment.buf[self.HEADER_SIZE:self.HEADER_SIZE + array.nbytes] = array.reshape(-1).view(np.uint8)
+        # mark the segment as ready after the data is written
+        segment.buf[0] = 1
+        self.segments[key] = segment
+        self.owned.add(key)
+        return self._view(segment)
+
+    def clear(self):
+        self._release(self.segments, self.owned)
+
+    @staticmethod
+    def _release(segments: dict, owned: set):
+        for key, segment in segments.items():
+            try:
+                segment.close()
+            except BufferError:
+                # views of the segment are still referenced, the mapping is released with them
+                pass
+            if key in owned:
+                # attached processes sharing the resource tracker may have removed the registration
+                resource_tracker.register(segment._name, 'shared_memory')
+                segment.unlink()
+        segments.clear()
+        owned.clear()
+
+
 class BaseDataset(Dataset):
     """
     Dataset base class preparing the data.
     """
+    shared_data = None
+
     @transform
     def __init__(self):
         pass
+
+    def enable_shared_memory(self, namespace: str):
+        """
+        Shares the decoded data loaded with load_shared between the processes of a host.
+        :param namespace: identifies the data source, e.g. the path of the meta file
+        :return:
+        """
+        self.shared_data = SharedDataCache(namespace)
+
+    def load_shared(self, key, load):
+        """
+        Returns a decoded sample from shared memory or decodes and stores it if shared memory is enabled.
+        :param key: sample key, e.g. the file name
+        :param load: function decoding the sample as numpy array
+        :return: decoded array
+        """
+        if self.shared_data is None:
+            return load()
+        array = self.shared_data.get(key)
+        if array is None:
+            array = self.shared_data.put(key, load())
+        return array
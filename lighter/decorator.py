@@ -1,6 +1,7 @@
 import functools
 import logging
 import inspect
+import weakref
 from typing import Tuple, List, Callable
 from enum import Enum
 from box import Box
@@ -9,7 +10,7 @@ from lighter.context import Context
 from lighter.exceptions import DependencyInjectionError
 from lighter.loader import Loader
 from lighter.misc import DotDict
-from lighter.registry import Registry
+from lighter.registry import Registry, LazyInstance
 from lighter.search import ParameterSearch
 from lighter.parameter import Parameter
 
@@ -17,13 +18,55 @@ DEFAULT_PROPERTIES = ['transform', 'dataset', 'data_builder', 'model', 'optimize
                       'collectible', 'criterion', 'metric', 'writer']
 
 
-def _handle_injections(args, injectables: List[str], ignore_none_values):
+class _InjectionPlan(object):
+    """
+    Flat resolution plan of the dotted injection paths of a decorated function.
+    The paths are split once at decoration time and the resolved parent containers are cached
+    per registry until the registry is mutated, such that scoped registries of concurrent threads
+    keep separate plans.
+    """
+    def __init__(self, paths: List[str], root: str = 'instances'):
+        self.paths = [(path, DotDict.split(path)[-1]) for path in paths]
+        self.root = root
+        self.plans = weakref.WeakKeyDictionary()
+
+    def resolve(self, registry: Registry):
+        version, steps = self.plans.get(registry, (None, None))
+        if steps is None or version != registry.version:
+            version = registry.version
+            root = getattr(registry, self.root)
+            steps = [(DotDict.resolve(root, path)[0], name, path)
+                     for path, name in self.paths]
+            self.plans[registry] = (version, steps)
+        return steps
+
+
+def _declare_dependencies(wrapper, paths: List[str], required: bool = True):
+    """
+    Records the registry instances a decorated function depends on, merged with the ones of the
+    wrapped function, such that the context can order the type instantiation. Optional dependencies
+    may be None when injected, therefore cycles containing them do not prevent the instantiation.
+    """
+    attribute = '__lighter_dependencies__' if required else '__lighter_optional_dependencies__'
+    dependencies = getattr(wrapper, attribute, frozenset())
+    setattr(wrapper, attribute, dependencies | {DotDict.split(path)[0] for path in paths})
+    return wrapper
+
+
+def _lookup(parent, name):
+    value = dict.get(parent, name)
+    # lazy instances are injected as proxies, since the box conversion would materialize them
+    if type(value) is LazyInstance:
+        return value
+    return getattr(parent, name, None)
+
+
+def _handle_injections(args, plan: _InjectionPlan, ignore_none_values):
     registry = Registry.get_instance()
     instance = args[0]
 
-    for inject in injectables:
-        parent, name = DotDict.resolve(registry.instances, inject)
-        value = getattr(parent, name, None)
+    for parent, name, inject in plan.resolve(registry):
+        value = _lookup(parent, name)
         if not ignore_none_values and value is None:
             raise DependencyInjectionError('Trying to inject dependency of unresolved '
                                            'key: {} into instance: {} with value: {}'
@@ -39,8 +82,8 @@ def _handle_config(args, path, source):
     if context.allow_context_changes and path is not None:
         imported_config, _ = Config.load(path=path)
         if source is not None:
-            parent, name = DotDict.resolve(config, source)
-            setattr(parent, name, imported_config)
+            # nested properties may be shared with copies of the config
+            config.set_value(source, imported_config)
         else:
             for k, v in imported_config.items():
                 setattr(config, k, v)
@@ -60,11 +103,13 @@ def _handle_registration(source):
 
 
 def _wrapper_delegate(func, injectables, ignore_none_values):
+    plan = _InjectionPlan(injectables)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        _handle_injections(args, injectables, ignore_none_values)
+        _handle_injections(args, plan, ignore_none_values)
         return func(*args, **kwargs)
-    return wrapper
+    return _declare_dependencies(wrapper, injectables, required=not ignore_none_values)
 
 
 def _search_and_load_type(instance):
@@ -175,34 +220,37 @@ def inject(source: str, property: str, option: InjectOption = InjectOption.Insta
     :return:
     """
     def decorator(func):
+        # registry lookups are compiled into a cached plan, config and search lookups only pre-split the path
+        if option == InjectOption.Instance:
+            plan = _InjectionPlan([source], root='instances')
+        elif option == InjectOption.Type:
+            plan = _InjectionPlan([source], root='types')
+        elif option in (InjectOption.Config, InjectOption.Search):
+            plan = None
+        else:
+            raise NotImplementedError()
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            context = Context.get_instance()
             obj_instance = args[0]
 
-            # if instances option selected lookup attribute or load if not already instantiated
-            if option == InjectOption.Instance:
+            if plan is not None:
                 registry = Registry.get_instance()
-                instance, key = DotDict.resolve(registry.instances, source)
-                value = getattr(instance, key, None)
+                (parent, key, _), = plan.resolve(registry)
+                value = _lookup(parent, key)
+                # if instances option selected load if not already instantiated
                 # prevent all side effects if allow_context_changes is False
-                if context.allow_context_changes and value is None:
+                if option == InjectOption.Instance and value is None \
+                        and Context.get_instance().allow_context_changes:
                     value = _search_and_load_type(source)
-            # otherwise if types then return simple type
-            elif option == InjectOption.Type:
-                registry = Registry.get_instance()
-                instance, key = DotDict.resolve(registry.types, source)
-                value = getattr(instance, key, None)
             elif option == InjectOption.Config:
                 config = Config.get_instance()
                 instance, key = DotDict.resolve(config, source)
                 value = getattr(instance, key, None)
-            elif option == InjectOption.Search:
+            else:
                 search = ParameterSearch.get_instance()
                 instance, key = DotDict.resolve(search, source)
                 value = getattr(instance, key, None)
-            else:
-                raise NotImplementedError()
 
             # if value is still None then through error, since it was never registered or failed to load
             if value is None:
@@ -211,6 +259,8 @@ def inject(source: str, property: str, option: InjectOption = InjectOption.Insta
 
             setattr(obj_instance, property, value)
             return func(*args, **kwargs)
+        if option == InjectOption.Instance:
+            return _declare_dependencies(wrapper, [source])
         return wrapper
     return decorator
 
@@ -270,13 +320,15 @@ def strategy(config: str, source: str = 'strategy', properties: list = None, ign
         properties = DEFAULT_PROPERTIES
 
     def decorator(func):
+        plan = _InjectionPlan(properties)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             _handle_config(args, config, source)
             _handle_registration(source)
-            _handle_injections(args, properties, ignore_none_values=ignore_none_values)
+            _handle_injections(args, plan, ignore_none_values=ignore_none_values)
             return func(*args, **kwargs)
-        return wrapper
+        return _declare_dependencies(wrapper, properties, required=not ignore_none_values)
     return decorator
 
 
@@ -287,11 +339,13 @@ def reference(name: str):
     :return:
     """
     def decorator(func):
+        plan = _InjectionPlan([name])
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            _handle_injections(args, [name], ignore_none_values=False)
+            _handle_injections(args, plan, ignore_none_values=False)
             return func(*args, **kwargs)
-        return wrapper
+        return _declare_dependencies(wrapper, [name])
     return decorator
 
 
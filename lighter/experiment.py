@@ -3,6 +3,8 @@ import torch
 import numpy as np
 from tqdm import tqdm
 from datetime import datetime
+from lighter.checkpoint import AsyncCheckpointer, CheckpointManager, save_checkpoint, save_sharded_checkpoint, \
+    load_checkpoint
 from lighter.decorator import device, context
 from lighter.misc import generate_long_id
 
@@ -20,7 +22,20 @@ class BaseExperiment(object):
                  epochs: int = 100,
                  enable_checkpoints: bool = True,
                  checkpoints_dir: str = 'runs/',
-                 checkpoints_interval: int = 1):
+                 checkpoints_interval: int = 1,
+                 keep_last_checkpoints: int = None,
+                 keep_best_checkpoints: int = None,
+                 checkpoint_metric: str = None,
+                 checkpoint_mode: str = 'max',
+                 resume_from: str = None):
+        """
+        :param keep_last_checkpoints: number of most recent checkpoints to keep, None keeps all or only the latest
+               if keep_best_checkpoints is set
+        :param keep_best_checkpoints: number of best checkpoints according to the checkpoint_metric to keep
+        :param checkpoint_metric: metric ranking the checkpoints, e.g. 'eval/acc'
+        :param checkpoint_mode: 'max' or 'min' to define if higher or lower metric values are better
+        :param resume_from: checkpoint directory of a previous run to resume from its latest checkpoint
+        """
         if experiment_id is None:
             experiment_id = generate_long_id()
         self.config['experiment_id'] = experiment_id
@@ -29,6 +44,15 @@ class BaseExperiment(object):
         self.enable_checkpoints = enable_checkpoints
         self.checkpoints_dir = checkpoints_dir
         self.checkpoints_interval = checkpoints_interval
+        self.keep_last_checkpoints = keep_last_checkpoints
+        self.keep_best_checkpoints = keep_best_checkpoints
+        self.checkpoint_metric = checkpoint_metric
+        self.checkpoint_mode = checkpoint_mode
+        self.resume_from = resume_from
+        self.checkpoint_path = None
+        self.checkpoints = None
+        # reduced metrics of each epoch executed by the current run
+        self.metrics = []
 
     def __call__(self, *args, **kwargs):
         self.run()
@@ -61,23 +85,46 @@ class BaseExperiment(object):
         """
         self.initialize()
         self.eval()
-        for epoch in tqdm(range(self.epochs)):
+        for epoch in tqdm(range(self.epoch, self.epochs)):
             self._epoch(epoch)
+            self.epoch = epoch + 1
         self.finalize()
 
     def initialize(self):
         """
         Initialize the experiment phase.
+        If resume_from is set, the experiment continues in that directory from its latest checkpoint.
         :return:
         """
         self.epoch = 0
+        self.metrics = []
+        path = self.resume_from
+        if path is None:
+            path = os.path.join(self.checkpoints_dir, self.config.context_id, self.config.experiment_id)
+        self.checkpoint_path = path
+        self.checkpoints = CheckpointManager(path,
+                                             keep_last=self.keep_last_checkpoints,
+                                             keep_best=self.keep_best_checkpoints,
+                                             metric=self.checkpoint_metric,
+                                             mode=self.checkpoint_mode)
+        if self.resume_from is not None:
+            ckpt_file = self.checkpoints.latest()
+            if ckpt_file is not None:
+                self.restore(load_checkpoint(ckpt_file, map_location=self.device))
         # save the new experiment config
-        path = os.path.join(self.checkpoints_dir, self.config.context_id, self.config.experiment_id)
         if not os.path.exists(path):
             os.makedirs(path)
         config_file = os.path.join(path, 'experiment.config.json')
         self.config.save(config_file)
 
+    def restore(self, state: dict):
+        """
+        Restores the experiment state from a loaded checkpoint and continues after its epoch.
+        :param state: checkpoint dictionary
+        :return:
+        """
+        self.epoch = state['epoch'] + 1
+
     def pre_epoch(self):
         """
         Hook that can be overridden before a training epoch starts.
@@ -126,7 +173,11 @@ class BaseExperiment(object):
 class DefaultExperiment(BaseExperiment):
     """
     Simple implementation of the experiment base class to execute train / eval runs.
+    Mixed precision and gradient accumulation are configured with the 'precision' ('bf16' or 'fp16') and
+    'accumulation_steps' keys of the 'experiment' config section or the 'experiment' section of the strategy config.
     """
+    PRECISIONS = {'fp32': None, 'bf16': torch.bfloat16, 'fp16': torch.float16}
+
     @device
     @context
     def __init__(self,
@@ -135,53 +186,174 @@ class DefaultExperiment(BaseExperiment):
                  enable_checkpoints: bool = True,
                  checkpoints_dir: str = 'runs/',
                  checkpoints_interval: int = 1,
-                 redux_function=np.mean):
+                 keep_last_checkpoints: int = None,
+                 keep_best_checkpoints: int = None,
+                 checkpoint_metric: str = None,
+                 checkpoint_mode: str = 'max',
+                 resume_from: str = None,
+                 redux_function=np.mean,
+                 streaming_metrics: bool = False,
+                 async_checkpoints: bool = False,
+                 checkpoint_format: str = 'torch',
+                 precision: str = None,
+                 accumulation_steps: int = None):
+        """
+        :param streaming_metrics: keeps the loss and confusion-matrix counts on the device and only synchronizes
+               them once per epoch; requires a StreamingCollectible collectible and a StreamingMetric metric
+        :param async_checkpoints: saves checkpoints on a background thread from a host memory snapshot
+        :param checkpoint_format: 'torch' for single torch.save files or 'sharded' for memory-mappable directories
+        :param precision: autocast precision 'fp32', 'bf16' or 'fp16', overrides the config option
+        :param accumulation_steps: number of batches to accumulate gradients for, overrides the config option
+        """
         super(DefaultExperiment, self).__init__(experiment_id=experiment_id,
                                                 epochs=epochs,
                                                 enable_checkpoints=enable_checkpoints,
                                                 checkpoints_dir=checkpoints_dir,
-                                                checkpoints_interval=checkpoints_interval)
+                                                checkpoints_interval=checkpoints_interval,
+                                                keep_last_checkpoints=keep_last_checkpoints,
+                                                keep_best_checkpoints=keep_best_checkpoints,
+                                                checkpoint_metric=checkpoint_metric,
+                                                checkpoint_mode=checkpoint_mode,
+                                                resume_from=resume_from)
         self.train_loader, self.val_loader = None, None
         self.redux_function = redux_function
+        self.streaming_metrics = streaming_metrics
+        if checkpoint_format not in ['torch', 'sharded']:
+            raise ValueError('DefaultExperiment: Unsupported checkpoint format: {}'.format(checkpoint_format))
+        self.save_checkpoint = save_sharded_checkpoint if checkpoint_format == 'sharded' else save_checkpoint
+        self.checkpointer = AsyncCheckpointer(save=self.save_checkpoint) if async_checkpoints else None
+        precision = self._option('precision', precision, 'fp32')
+        if precision not in DefaultExperiment.PRECISIONS:
+            raise ValueError('DefaultExperiment: Unsupported precision: {}'.format(precision))
+        self.precision = DefaultExperiment.PRECISIONS[precision]
+        self.accumulation_steps = int(self._option('accumulation_steps', accumulation_steps, 1))
+        self.device_type = str(self.device).split(':')[0]
+        # loss scaling is only required for fp16 on cuda devices
+        self.scaler = torch.amp.GradScaler('cuda', enabled=precision == 'fp16' and self.device_type == 'cuda')
+        self.accumulated = 0
+
+    def _option(self, name: str, value, default):
+        """
+        Returns the value if set, otherwise the option of the experiment or strategy experiment config section.
+        """
+        if value is not None:
+            return value
+        strategy = self.config.get('strategy')
+        for section in [self.config.get('experiment'), strategy.get('experiment') if strategy else None]:
+            if isinstance(section, dict) and section.get(name) is not None:
+                return section.get(name)
+        return default
+
+    def autocast(self):
+        """
+        Returns the autocast context for forward passes according to the configured precision.
+        """
+        return torch.autocast(device_type=self.device_type, dtype=self.precision,
+                              enabled=self.precision is not None)
+
+    def optimizer_step(self):
+        """
+        Performs an optimizer step with the accumulated (and scaled) gradients.
+        :return:
+        """
+        if self.scaler.is_enabled():
+            self.scaler.step(getattr(self.optimizer, 'optimizer', self.optimizer))
+            self.scaler.update()
+        else:
+            self.optimizer.step()
 
     def initialize(self):
         # get data loaders
         self.train_loader, self.val_loader = self.data_builder.loader()
         super().initialize()
 
+    def restore(self, state: dict):
+        self.model.load_state_dict(state['model_state_dict'])
+        self.optimizer.load_state_dict(state['optimizer_state_dict'])
+        if 'scaler_state_dict' in state:
+            self.scaler.load_state_dict(state['scaler_state_dict'])
+        super().restore(state)
+
     def pre_epoch(self):
         pass
 
+    def finalize(self):
+        if self.checkpointer is not None:
+            self.checkpointer.wait()
+        self.writer.flush()
+        self.context.report()
+
     def post_epoch(self):
+        self.metrics.append({k: float(v) for k, v in self.redux().items()})
         self.writer.step()
         self.collectible.reset()
+        if self.streaming_metrics:
+            self.metric.reset()
+
+    def collect(self, category: str, loss, pred, y):
+        """
+        Updates the collectible with the loss and metrics of a batch.
+        :param category: collectible category of the batch
+        :param loss: batch loss
+        :param pred: batch prediction
+        :param y: batch target
+        :return:
+        """
+        if self.streaming_metrics:
+            self.collectible.update(category=category, **{'loss': loss.detach()})
+            self.metric.update(pred.detach(), y.detach(), category=category)
+        else:
+            self.collectible.update(category=category, **{'loss': loss.detach().cpu().item()})
+            self.collectible.update(category=category, **self.metric(pred.detach().cpu(),
+                                                                     y.detach().cpu()))
+
+    def redux(self, category: str = None):
+        """
+        Reduces the collected values of the current epoch.
+        :param category: Only reduces the values of the category if specified.
+        :return: Dictionary with reduced single numbers per key.
+        """
+        collection = self.collectible.redux(func=self.redux_function, category=category)
+        if self.streaming_metrics:
+            collection.update(self.metric.redux(category=category))
+        return collection
 
     def train_batch(self, x, y):
         x, y = x.to(self.device), y.to(self.device)
-        self.optimizer.zero_grad()
-        pred = self.model(x)
-        loss = self.criterion(pred, y)
-        loss.backward()
-        self.optimizer.step()
-        self.collectible.update(category='train', **{'loss': loss.detach().cpu().item()})
-        self.collectible.update(category='train', **self.metric(pred.detach().cpu(),
-                                                                y.detach().cpu()))
+        if self.accumulated % self.accumulation_steps == 0:
+            self.optimizer.zero_grad()
+        with self.autocast():
+            pred = self.model(x)
+            loss = self.criterion(pred, y)
+        # the gradients are averaged over the accumulated batches, the collected loss stays unscaled
+        self.scaler.scale(loss / self.accumulation_steps).backward()
+        self.accumulated += 1
+        if self.accumulated % self.accumulation_steps == 0:
+            self.optimizer_step()
+        self.collect('train', loss, pred, y)
 
     def train(self):
         if self.train_loader is not None:
             self.model.train()
+            self.accumulated = 0
             for i, (x, y) in enumerate(self.train_loader):
                 self.train_batch(x, y)
-            collection = self.collectible.redux(func=self.redux_function)
+            # step the remaining accumulated gradients of the epoch, averaged over the remaining batches
+            remainder = self.accumulated % self.accumulation_steps
+            if remainder != 0:
+                for param in self.model.parameters():
+                    if param.grad is not None:
+                        param.grad.mul_(self.accumulation_steps / remainder)
+                self.optimizer_step()
+            collection = self.redux(category='train')
             self.writer.write(category='train', **collection)
 
     def eval_batch(self, x, y):
         x, y = x.to(self.device), y.to(self.device)
-        pred = self.model(x)
-        loss = self.criterion(pred, y)
-        self.collectible.update(category='eval', **{'loss': loss.detach().cpu().item()})
-        self.collectible.update(category='eval', **self.metric(pred.detach().cpu(),
-                                                               y.detach().cpu()))
+        with self.autocast():
+            pred = self.model(x)
+            loss = self.criterion(pred, y)
+        self.collect('eval', loss, pred, y)
 
     def eval(self):
         if self.val_loader is not None:
@@ -189,19 +361,28 @@ class DefaultExperiment(BaseExperiment):
             with torch.no_grad():
                 for i, (x, y) in enumerate(self.val_loader):
                     self.eval_batch(x, y)
-                collection = self.collectible.redux(func=self.redux_function)
+                collection = self.redux(category='eval')
                 self.writer.write(category='eval', **collection)
 
     def checkpoint(self, epoch: int):
         if self.enable_checkpoints and epoch % self.checkpoints_interval == 0:
-            collection = self.collectible.redux(func=self.redux_function)
+            collection = self.redux()
             timestamp = datetime.timestamp(datetime.now())
             file_name = 'e-{}_time-{}'.format(epoch, timestamp)
-            path = os.path.join(self.checkpoints_dir, self.config.context_id, self.config.experiment_id)
-            ckpt_file = os.path.join(path, '{}.ckpt'.format(file_name))
-            torch.save({
+            ckpt_file = os.path.join(self.checkpoint_path, '{}.ckpt'.format(file_name))
+            state = {
                 'epoch': epoch,
                 'model_state_dict': self.model.state_dict(),
                 'optimizer_state_dict': self.optimizer.state_dict(),
-                'metrics': collection
-            }, ckpt_file)
+                'metrics': {k: float(v) for k, v in collection.items()}
+            }
+            if self.scaler.is_enabled():
+                state['scaler_state_dict'] = self.scaler.state_dict()
+
+            def register():
+                self.checkpoints.register(ckpt_file, epoch, collection)
+            if self.checkpointer is not None:
+                self.checkpointer.submit(state, ckpt_file, callback=register)
+            else:
+                self.save_checkpoint(state, ckpt_file)
+                register()
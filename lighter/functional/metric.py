@@ -1,3 +1,6 @@
+import torch
+
+
 def TP(target, prediction):
     """
     True positives.
@@ -38,140 +41,185 @@ def FN(target, prediction):
     return (target.float() * (prediction.float().round() == 0).float()).sum()
 
 
-def TPR(target, prediction, eps=1e-7):
+def confusion_counts(target, prediction):
+    """
+    Confusion-matrix counts computed in a single pass.
+    :param target: target value
+    :param prediction: prediction value
+    :return: tensor with the true positives, true negatives, false positives and false negatives
+    """
+    target, prediction = torch.broadcast_tensors(target.float(), prediction.float().round())
+    p, pp, tp = torch.stack([target, prediction, target * prediction]).reshape(3, -1).sum(dim=1)
+    fn = p - tp
+    fp = pp - tp
+    tn = target.numel() - tp - fn - fp
+    return torch.stack([tp, tn, fp, fn])
+
+
+def confusion_counts_thresholds(target, prediction, thresholds):
+    """
+    Confusion-matrix counts for multiple thresholds computed in a single pass.
+    A prediction counts as positive if it is greater than the threshold.
+    :param target: target value
+    :param prediction: prediction value
+    :param thresholds: sequence or 1-d tensor of K thresholds
+    :return: tensor of shape (4, K) with the true positives, true negatives, false positives and false negatives
+    """
+    target, prediction = torch.broadcast_tensors(target.float(), prediction.float())
+    target, prediction = target.reshape(1, -1), prediction.reshape(1, -1)
+    thresholds = torch.as_tensor(thresholds, dtype=prediction.dtype, device=prediction.device).reshape(-1, 1)
+    prediction = (prediction > thresholds).float()
+    p = target.sum()
+    pp = prediction.sum(dim=1)
+    tp = (prediction * target).sum(dim=1)
+    fn = p - tp
+    fp = pp - tp
+    tn = target.numel() - tp - fn - fp
+    return torch.stack([tp, tn, fp, fn])
+
+
+def _counts(target, prediction, counts):
+    if counts is None:
+        return confusion_counts(target, prediction)
+    return counts
+
+
+def TPR(target, prediction, eps=1e-7, counts=None):
     """
     True positive rate metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    tp = TP(target, prediction)
-    fn = FN(target, prediction)
+    tp, _, _, fn = _counts(target, prediction, counts)
     s = tp + fn + eps
     return tp / s
 
 
-def TNR(target, prediction, eps=1e-7):
+def TNR(target, prediction, eps=1e-7, counts=None):
     """
     True negative rate metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    tn = TN(target, prediction)
-    fp = FP(target, prediction)
+    _, tn, fp, _ = _counts(target, prediction, counts)
     s = (tn + fp + eps)
-    assert (s > 0)
+    assert (s > 0).all()
     return tn / s
 
 
-def FPR(target, prediction, eps=1e-7):
+def FPR(target, prediction, eps=1e-7, counts=None):
     """
     False positive rate metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    fp = FP(target, prediction)
-    tn = TN(target, prediction)
+    _, tn, fp, _ = _counts(target, prediction, counts)
     s = fp + tn + eps
-    assert (s > 0)
+    assert (s > 0).all()
     return fp / s
 
 
-def FNR(target, prediction, eps=1e-7):
+def FNR(target, prediction, eps=1e-7, counts=None):
     """
     False negative rate metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    fn = FN(target, prediction)
-    tp = TP(target, prediction)
+    tp, _, _, fn = _counts(target, prediction, counts)
     s = fn + tp + eps
-    assert (s > 0)
+    assert (s > 0).all()
     return fn / s
 
 
-def ACC(target, prediction, eps=1e-7):
+def ACC(target, prediction, eps=1e-7, counts=None):
     """
     Accuracy metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    tp = TP(target, prediction)
-    tn = TN(target, prediction)
-    p = target.sum().float()
-    n = (target == 0).sum().float()
+    tp, tn, fp, fn = _counts(target, prediction, counts)
+    p = tp + fn
+    n = tn + fp
     s = p + n + eps
-    assert (s > 0)
+    assert (s > 0).all()
     return (tp + tn) / s
 
 
-def BACC(target, prediction, eps=1e-7):
+def BACC(target, prediction, eps=1e-7, counts=None):
     """
     Balanced accuracy metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    tp = TP(target, prediction)
-    tn = TN(target, prediction)
-    p = target.sum().float()
-    n = (target == 0).sum().float()
+    tp, tn, fp, fn = _counts(target, prediction, counts)
+    p = tp + fn
+    n = tn + fp
     s = (p + eps) + tn / (n + eps)
-    assert (s > 0)
+    assert (s > 0).all()
     return 0.5 * (tp / s)
 
 
-def precision(target, prediction, eps=1e-7):
+def precision(target, prediction, eps=1e-7, counts=None):
     """
     Precision metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    tp = TP(target, prediction)
-    fp = FP(target, prediction)
+    tp, _, fp, _ = _counts(target, prediction, counts)
     s = (tp + fp + eps)
-    assert (s > 0)
+    assert (s > 0).all()
     return tp / s
 
 
-def recall(target, prediction, eps=1e-7):
+def recall(target, prediction, eps=1e-7, counts=None):
     """
     Recall metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    tp = TP(target, prediction)
-    fn = FN(target, prediction)
+    tp, _, _, fn = _counts(target, prediction, counts)
     s = (tp + fn + eps)
-    assert (s > 0)
+    assert (s > 0).all()
     return tp / s
 
 
-def f1_score(target, prediction, eps=1e-7):
+def f1_score(target, prediction, eps=1e-7, counts=None):
     """
     F1-score metric.
     :param target: target value
     :param prediction: prediction value
     :param eps: epsilon to avoid zero division
+    :param counts: optional precomputed confusion_counts
     :return:
     """
-    precision_ = precision(target, prediction)
-    recall_ = recall(target, prediction)
+    counts = _counts(target, prediction, counts)
+    precision_ = precision(target, prediction, counts=counts)
+    recall_ = recall(target, prediction, counts=counts)
     n = (precision_ * recall_)
     s = (precision_ + recall_ + eps)
-    assert (s > 0)
+    assert (s > 0).all()
     return 2 * (n / s)
@@ -0,0 +1,248 @@
+import os
+import math
+import random
+import logging
+import traceback
+import contextlib
+import torch
+from collections import namedtuple
+from lighter.context import Context
+from lighter.decorator import context
+from lighter.jobs import DONE
+from lighter.loader import Loader
+from lighter.scheduler import ComponentCache, WorkerPool, DEFAULT_REUSE
+from lighter.search import SearchSpace
+
+# state of a trial after its last rung, the value is None if the trial failed or reported no metric
+Trial = namedtuple('Trial', ['index', 'config', 'path', 'epochs', 'value'])
+
+
+def train(experiment, epochs: int, path: str, metric: str):
+    """
+    Trains an experiment of the current context up to an epoch budget, resuming from the latest checkpoint.
+    :param experiment: experiment type
+    :param epochs: total number of epochs
+    :param path: checkpoint directory of the trial
+    :param metric: collection key of the ranking metric
+    :return: metric value of the last epoch or None
+    """
+    experiment = experiment()
+    experiment.epochs = epochs
+    experiment.resume_from = path
+    experiment.run()
+    if len(experiment.metrics) > 0:
+        return experiment.metrics[-1].get(metric)
+    return None
+
+
+class HalvingTrial(object):
+    """
+    Experiment of the worker pool, which trains a trial according to the 'halving' config section
+    and returns its metric value.
+    """
+    @context
+    def __init__(self):
+        self.options = self.config.halving
+
+    def __call__(self):
+        return train(Loader.import_path(self.options.experiment), self.options.epochs, self.options.path,
+                     self.options.metric)
+
+
+class SuccessiveHalving(object):
+    """
+    Successive halving over the permutations of a search space with synchronous rungs.
+    All trials of a rung are trained up to the epoch budget of the rung and ranked by a per-epoch metric
+    of their last epoch. The best 1/eta trials are promoted to the next rung with eta times the budget and
+    resume from the latest checkpoint of their previous rung, the remaining trials are stopped. The last
+    rung trains the remaining trials up to the maximum budget.
+    Without workers the trials run one after another in the calling process, otherwise the trials of a rung
+    run in parallel on a WorkerPool. Each trial runs in its own context scope, such that the experiment
+    requires checkpoints to resume.
+    """
+    def __init__(self,
+                 space: SearchSpace,
+                 experiment: str,
+                 metric: str,
+                 mode: str = 'max',
+                 min_epochs: int = 1,
+                 max_epochs: int = 27,
+                 eta: int = 3,
+                 output_path: str = 'runs/halving',
+                 device: str = None,
+                 reuse=DEFAULT_REUSE,
+                 num_workers: int = None):
+        """
+        :param space: search space of the trials
+        :param experiment: path of the experiment type
+        :param metric: collection key of the ranking metric within the experiment metrics, e.g. '$eval$_acc'
+        :param mode: 'max' or 'min' to define if higher or lower metric values are better
+        :param min_epochs: epoch budget of the first rung
+        :param max_epochs: maximum epoch budget of a trial
+        :param eta: reduction factor of the trials and growth factor of the budget per rung
+        :param output_path: directory of the trial checkpoints
+        :param device: device of the trials
+        :param reuse: components reused by consecutive trials, see ComponentCache
+        :param num_workers: number of worker processes running the trials of a rung in parallel, each on its own
+               device index of the device type, None runs the trials in the calling process
+        """
+        if mode not in ['max', 'min']:
+            raise ValueError('SuccessiveHalving: Unsupported mode: {}'.format(mode))
+        if eta < 2:
+            raise ValueError('SuccessiveHalving: eta must be at least 2, got {}'.format(eta))
+        self.space = space
+        self.experiment_path = experiment
+        self.experiment = Loader.import_path(experiment)
+        self.metric = metric
+        self.mode = mode
+        self.min_epochs = min_epochs
+        self.max_epochs = max_epochs
+        self.eta = eta
+        self.output_path = output_path
+        self.device = device
+        self.reuse = reuse
+        self.num_workers = num_workers
+        self.components = ComponentCache(reuse)
+        self.pool = None
+
+    def rungs(self, trials: int, min_epochs: int = None) -> list:
+        """
+        Computes the number of trials and the epoch budget of each rung.
+        :param trials: number of trials of the first rung
+        :param min_epochs: epoch budget of the first rung, defaults to the min_epochs setting
+        :return: list of (trials, epochs) tuples
+        """
+        epochs = self.min_epochs if min_epochs is None else min_epochs
+        rungs = []
+        while trials >= 1 and epochs <= self.max_epochs:
+            rungs.append((trials, epochs))
+            trials //= self.eta
+            epochs *= self.eta
+        if len(rungs) > 0:
+            rungs[-1] = (rungs[-1][0], self.max_epochs)
+        return rungs
+
+    def rank(self, trials: list) -> list:
+        """
+        Sorts trials by their metric value, failed trials are excluded.
+        :param trials: list of trials
+        :return: ranked trials, the best first
+        """
+        valid = [trial for trial in trials if trial.value is not None and not math.isnan(trial.value)]
+        return sorted(valid, key=lambda trial: trial.value, reverse=self.mode == 'max')
+
+    def run_trial(self, trial: Trial, epochs: int) -> Trial:
+        """
+        Trains a trial up to an epoch budget in the calling process.
+        :param trial: trial to continue
+        :param epochs: total number of epochs of the trial
+        :return: updated trial
+        """
+        value = None
+        try:
+            with Context.scope(config_dict=trial.config.to_dict(),
+                               device=self.device,
+                               auto_instantiate_types=False,
+                               allow_context_changes=False) as context:
+                self.components.instantiate_types(context)
+                value = train(self.experiment, epochs, trial.path, self.metric)
+        except Exception:
+            logging.error('SuccessiveHalving: Trial failed: {}\n{}'.format(trial.path, traceback.format_exc()))
+        return self._report(trial._replace(epochs=epochs, value=value))
+
+    def _report(self, trial: Trial) -> Trial:
+        if trial.value is None:
+            logging.warning('SuccessiveHalving: Trial reported no metric {}: {}'.format(self.metric, trial.path))
+        return trial
+
+    def run_rung(self, trials: list, epochs: int) -> list:
+        """
+        Trains the trials of a rung up to an epoch budget, in parallel if a worker pool is running.
+        :param trials: trials to continue
+        :param epochs: total number of epochs of the trials
+        :return: updated trials
+        """
+        if self.pool is None:
+            return [self.run_trial(trial, epochs) for trial in trials]
+        configs = []
+        for trial in trials:
+            config = trial.config.to_dict()
+            config['halving'] = {'experiment': self.experiment_path, 'epochs': epochs, 'path': trial.path,
+                                 'metric': self.metric}
+            configs.append(config)
+        results = self.pool.map(configs)
+        return [self._report(trial._replace(epochs=epochs, value=result.result if result.status == DONE else None))
+                for trial, result in zip(trials, results)]
+
+    @contextlib.contextmanager
+    def workers(self):
+        """
+        Starts the worker pool for the duration of a block, if workers are configured and no pool is running.
+        """
+        if self.num_workers is None or self.pool is not None:
+            yield self.pool
+            return
+        device = self.device
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        with WorkerPool('lighter.halving.HalvingTrial', device_name=device, num_workers=self.num_workers,
+                        reuse=self.reuse) as pool:
+            self.pool = pool
+            try:
+                yield pool
+            finally:
+                self.pool = None
+
+    def run(self, indices: list = None, min_epochs: int = None) -> list:
+        """
+        Runs successive halving over permutations of the search space.
+        :param indices: permutation indices of the trials, defaults to the whole search space
+        :param min_epochs: epoch budget of the first rung, defaults to the min_epochs setting
+        :return: ranked trials of the last rung
+        """
+        if indices is None:
+            indices = range(len(self.space))
+        trials = []
+        for index in indices:
+            config = self.space[index]
+            trials.append(Trial(index, config, os.path.join(self.output_path, config.experiment_id), 0, None))
+        with self.workers():
+            for rung, (size, epochs) in enumerate(self.rungs(len(trials), min_epochs)):
+                if rung > 0:
+                    trials = self.rank(trials)[:size]
+                logging.info('SuccessiveHalving: Rung {} with {} trials and {} epochs'.format(rung, len(trials),
+                                                                                           epochs))
+                trials = self.run_rung(trials, epochs)
+        return self.rank(trials)
+
+
+class Hyperband(SuccessiveHalving):
+    """
+    Runs several successive halving brackets, which trade off the number of sampled trials against their
+    minimum epoch budget, from many short trials to few trials trained for the maximum budget.
+    """
+    def brackets(self) -> list:
+        """
+        Computes the number of trials and the epoch budget of the first rung of each bracket.
+        :return: list of (trials, epochs) tuples
+        """
+        s_max = int(math.log(self.max_epochs / self.min_epochs, self.eta) + 1e-9)
+        brackets = []
+        for s in reversed(range(s_max + 1)):
+            trials = int(math.ceil((s_max + 1) / (s + 1) * self.eta ** s))
+            brackets.append((trials, self.max_epochs // self.eta ** s))
+        return brackets
+
+    def run(self, seed: int = None) -> list:
+        """
+        Runs all brackets on randomly sampled permutations of the search space.
+        :param seed: random seed of the sampled permutations
+        :return: ranked best trials of the brackets
+        """
+        generator = random.Random(seed)
+        results = []
+        with self.workers():
+            for trials, epochs in self.brackets():
+                indices = generator.sample(range(len(self.space)), min(trials, len(self.space)))
+                results.extend(SuccessiveHalving.run(self, indices, min_epochs=epochs)[:1])
+        return self.rank(results)
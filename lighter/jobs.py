@@ -0,0 +1,149 @@
+import sqlite3
+import time
+from collections import namedtuple
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+Job = namedtuple('Job', ['id', 'file', 'attempts'])
+
+
+class JobQueue(object):
+    """
+    SQLite backed job queue shared by the worker processes of a schedule.
+    Workers pull the next pending job when they are idle, such that the run time of a sweep depends on
+    the total work instead of the slowest static shard. Failed jobs are retried up to max_retries times.
+    """
+    def __init__(self, path: str, max_retries: int = 0, timeout: float = 60.):
+        """
+        :param path: path of the database file
+        :param max_retries: number of retries of failed jobs
+        :param timeout: seconds to wait for the database lock
+        """
+        self.path = path
+        self.max_retries = max_retries
+        self.timeout = timeout
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                               'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                               'file TEXT UNIQUE NOT NULL, '
+                               'status TEXT NOT NULL, '
+                               'attempts INTEGER NOT NULL DEFAULT 0, '
+                               'worker TEXT, '
+                               'error TEXT, '
+                               'started REAL, '
+                               'finished REAL)')
+
+    def _connect(self) -> "_Connection":
+        # connections are opened per operation, since they cannot be shared between processes
+        return _Connection(sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None))
+
+    def add(self, files: list) -> int:
+        """
+        Adds config files as pending jobs, files which are already queued are ignored.
+        :param files: list of config files
+        :return: number of added jobs
+        """
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            cursor = connection.executemany('INSERT OR IGNORE INTO jobs (file, status) VALUES (?, ?)',
+                                            [(file, PENDING) for file in files])
+            connection.execute('COMMIT')
+            return cursor.rowcount
+
+    def acquire(self, worker: str) -> Job:
+        """
+        Marks the next pending job as running for a worker.
+        :param worker: name of the worker
+        :return: job or None if no job is pending
+        """
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT id, file, attempts FROM jobs WHERE status = ? ORDER BY id LIMIT 1',
+                                     (PENDING,)).fetchone()
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+            connection.execute('UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started = ?, '
+                               'finished = NULL WHERE id = ?', (RUNNING, worker, time.time(), row[0]))
+            connection.execute('COMMIT')
+            return Job(row[0], row[1], row[2] + 1)
+
+    def complete(self, job: Job):
+        with self._connect() as connection:
+            connection.execute('UPDATE jobs SET status = ?, error = NULL, finished = ? WHERE id = ?',
+                               (DONE, time.time(), job.id))
+
+    def fail(self, job: Job, error: str = None):
+        """
+        Marks a job as failed or queues it again if retries are left.
+        :param job: failed job
+        :param error: error message or traceback
+        :return:
+        """
+        status = PENDING if job.attempts <= self.max_retries else FAILED
+        with self._connect() as connection:
+            connection.execute('UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?',
+                               (status, error, time.time(), job.id))
+
+    def requeue_running(self) -> int:
+        """
+        Queues running jobs again, e.g. after the workers of a previous run were terminated.
+        :return: number of queued jobs
+        """
+        with self._connect() as connection:
+            return connection.execute('UPDATE jobs SET status = ?, worker = NULL WHERE status = ?',
+                                      (PENDING, RUNNING)).rowcount
+
+    def jobs(self, status: str = None) -> list:
+        """
+        Lists the jobs with their state.
+        :param status: optional status filter
+        :return: list of dictionaries
+        """
+        query = 'SELECT id, file, status, attempts, worker, error, started, finished FROM jobs'
+        args = ()
+        if status is not None:
+            query += ' WHERE status = ?'
+            args = (status,)
+        with self._connect() as connection:
+            rows = connection.execute(query + ' ORDER BY id', args).fetchall()
+        keys = ['id', 'file', 'status', 'attempts', 'worker', 'error', 'started', 'finished']
+        return [dict(zip(keys, row)) for row in rows]
+
+    def progress(self) -> dict:
+        """
+        Returns the number of jobs per status and the running jobs per worker.
+        :return: progress dictionary
+        """
+        with self._connect() as connection:
+            counts = dict(connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            running = dict(connection.execute('SELECT worker, file FROM jobs WHERE status = ?',
+                                              (RUNNING,)).fetchall())
+        progress = {status: counts.get(status, 0) for status in (PENDING, RUNNING, DONE, FAILED)}
+        progress['total'] = sum(counts.values())
+        progress['workers'] = running
+        return progress
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+
+
+class _Connection(object):
+    """
+    Closes the wrapped connection when leaving the context, unlike sqlite3.Connection which only commits.
+    """
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is not None and self.connection.in_transaction:
+            self.connection.execute('ROLLBACK')
+        self.connection.close()
@@ -1,42 +1,96 @@
 import importlib
+import sys
 import traceback
 import logging
 
 from threading import RLock
+from lighter.profiler import Profiler
 from lighter.registry import Registry
 
+TYPE_PREFIX = 'type::'
+
 
 class Loader(object):
     _instance = None
     # mutex for threadsafe instance loading
     _mutex = RLock()
+    # resolved types and failed imports of previous calls keyed by their path
+    _types = {}
+    _failures = {}
 
     @staticmethod
     def import_modules(modules: dict):
         """
         Registers a dictionary of modules to the registry.
+        Each unique path is only resolved once.
         :param modules: list of types
         :return:
         """
+        types = {v: Loader.import_path(v) for v in set(modules.values()) if isinstance(v, str)}
+        registry = Registry.get_instance()
         for k, v in modules.items():
             if isinstance(v, str):
-                module = Loader.import_path(v)
-                setattr(Registry.get_instance().types, k, module)
+                setattr(registry.types, k, types[v])
 
     @staticmethod
     def import_path(name: str):
         """
         Imports a defined python type.
+        Resolved types are cached, failed imports are cached and warned once until the python path changes.
         :param name: path to a python module
         :return:
         """
-        type_ = None
+        type_ = Loader._types.get(name)
+        if type_ is not None:
+            return type_
+        path = tuple(sys.path)
+        if Loader._failures.get(name) == path:
+            return None
+        Loader._mutex.acquire()
         try:
-            components = name.split('.')
-            module = importlib.import_module('.'.join(components[:-1]))
-            type_ = getattr(module, components[-1])
+            if name in Loader._types:
+                return Loader._types[name]
+            with Profiler.get_instance().record('import', name):
+                components = name.split('.')
+                module = importlib.import_module('.'.join(components[:-1]))
+                type_ = getattr(module, components[-1])
+            Loader._types[name] = type_
+            Loader._failures.pop(name, None)
         except Exception as e:
             tb = traceback.format_exc()
+            Loader._failures[name] = path
             logging.warning('Loader: Could not import: {} - {}'.format(name, e))
             logging.warning(tb)
+        finally:
+            Loader._mutex.release()
         return type_
+
+    @staticmethod
+    def prewarm(config) -> dict:
+        """
+        Resolves all 'type::' references of a config tree, e.g. before compiling a search.
+        :param config: config dictionary
+        :return: dictionary of the referenced paths and their types
+        """
+        paths = []
+
+        def collect(value):
+            if isinstance(value, dict):
+                for v in dict.values(value):
+                    collect(v)
+            elif isinstance(value, (list, tuple)):
+                for v in value:
+                    collect(v)
+            elif isinstance(value, str) and value.startswith(TYPE_PREFIX):
+                paths.append(value[len(TYPE_PREFIX):])
+        collect(config)
+        return {path: Loader.import_path(path) for path in dict.fromkeys(paths)}
+
+    @staticmethod
+    def clear_cache():
+        Loader._mutex.acquire()
+        try:
+            Loader._types.clear()
+            Loader._failures.clear()
+        finally:
+            Loader._mutex.release()
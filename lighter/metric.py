@@ -1,3 +1,5 @@
+import torch
+from lighter.collectible import BaseCollectible
 from lighter.decorator import context
 from lighter.functional.metric import *
 
@@ -10,15 +12,79 @@ class BaseMetric(object):
     def __init__(self):
         pass
 
-    def __call__(self, prediction, target):
+    @staticmethod
+    def from_counts(counts) -> dict:
+        """
+        Derives all metrics from confusion-matrix counts.
+        :param counts: tensor as returned by confusion_counts or confusion_counts_thresholds
+        :return: Dictionary with the metric tensors.
+        """
         return {
-            'acc': ACC(target, prediction).item(),
-            'bacc': BACC(target, prediction).item(),
-            'precision': precision(target, prediction).item(),
-            'recall': recall(target, prediction).item(),
-            'f1_score': f1_score(target, prediction).item(),
-            'tpr': TPR(target, prediction).item(),
-            'tnr': TNR(target, prediction).item(),
-            'fpr': FPR(target, prediction).item(),
-            'fnr': FNR(target, prediction).item()
+            'acc': ACC(None, None, counts=counts),
+            'bacc': BACC(None, None, counts=counts),
+            'precision': precision(None, None, counts=counts),
+            'recall': recall(None, None, counts=counts),
+            'f1_score': f1_score(None, None, counts=counts),
+            'tpr': TPR(None, None, counts=counts),
+            'tnr': TNR(None, None, counts=counts),
+            'fpr': FPR(None, None, counts=counts),
+            'fnr': FNR(None, None, counts=counts)
         }
+
+    def __call__(self, prediction, target):
+        metrics = self.from_counts(confusion_counts(target, prediction))
+        # single host synchronization for all metrics
+        values = torch.stack(list(metrics.values())).tolist()
+        return dict(zip(metrics.keys(), values))
+
+
+class StreamingMetric(BaseMetric):
+    """
+    Metric class accumulating the confusion-matrix counts per category on the device of the predictions.
+    The counts are only moved to the host once per epoch when calling redux.
+    """
+    @context
+    def __init__(self):
+        super(StreamingMetric, self).__init__()
+        self.counts = {}
+
+    def reset(self):
+        """
+        Resets the accumulated counts.
+        :return:
+        """
+        self.counts = {}
+
+    def update(self, prediction, target, category: str = None):
+        """
+        Adds the confusion-matrix counts of a batch to the running counts without a device synchronization.
+        :param prediction: prediction value
+        :param target: target value
+        :param category: defines a group category for the counts
+        :return:
+        """
+        counts = confusion_counts(target, prediction)
+        if category in self.counts:
+            self.counts[category] += counts
+        else:
+            self.counts[category] = counts
+
+    def redux(self, category: str = None) -> dict:
+        """
+        Computes the metrics from the accumulated counts.
+        :param category: Only computes the metrics of the category if specified.
+        :return: Dictionary with the metrics per collectible key.
+        """
+        categories = list(self.counts.keys()) if category is None else [category]
+        categories = [c for c in categories if c in self.counts]
+        if len(categories) == 0:
+            return {}
+        counts = torch.stack([self.counts[c] for c in categories], dim=1).double()
+        metrics = self.from_counts(counts)
+        # single host synchronization for all categories and metrics
+        values = torch.stack(list(metrics.values())).cpu().tolist()
+        redux = {}
+        for key, row in zip(metrics.keys(), values):
+            for category, value in zip(categories, row):
+                redux[BaseCollectible.key(key, category)] = value
+        return redux
@@ -1,4 +1,5 @@
 import json
+import functools
 import petname
 import sys
 from box import Box
@@ -50,11 +51,19 @@ def _to_json(obj, filename=None,
 
 
 class DotDict:
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def split(name: str) -> tuple:
+        """
+        Splits a dot-separated reference once and caches the result.
+        """
+        return tuple(name.split('.'))
+
     @staticmethod
     def resolve(parent_ori, name_ori):
         parent = parent_ori
         prev_parent = parent_ori
-        groups = name_ori.split('.')
+        groups = DotDict.split(name_ori)
         for group in groups[:-1]:
             parent = parent.get(group)
             if parent is None:
@@ -13,7 +13,7 @@ class BaseOptimizer(object):
         return self.optimizer.state_dict()
 
     def load_state_dict(self, state_dict):
-        self.optimizer.state_dict(state_dict)
+        self.optimizer.load_state_dict(state_dict)
 
     def zero_grad(self):
         self.optimizer.zero_grad()
@@ -25,6 +25,21 @@ class Parameter(object):
     def list_values(self) -> list:
         raise NotImplementedError('Parameter: No implementation found!')
 
+    def values(self) -> list:
+        """
+        Returns the values in the same order as the iteration of the parameter.
+        """
+        raise NotImplementedError('Parameter: No implementation found!')
+
+    def apply(self, config: Config, value):
+        """
+        Applies a value of the parameter to a config.
+        :param config: config to update
+        :param value: one of the parameter values
+        :return:
+        """
+        config.set_value(self.ref, value)
+
     @property
     def value(self):
         return self.config.get_value(self.ref)
@@ -63,6 +78,14 @@ class GridParameter(Parameter):
     def list_values(self) -> list:
         return list([self.min + i * self.step for i in range(int((self.max - self.min) // self.step))])
 
+    def values(self) -> list:
+        values = []
+        value = self.min
+        while value <= self.max:
+            values.append(value)
+            value += self.step
+        return values
+
 
 class SetParameter(Parameter):
     """
@@ -88,6 +111,9 @@ class SetParameter(Parameter):
     def list_values(self) -> list:
         return [self.option]
 
+    def values(self) -> list:
+        return [self.option]
+
 
 class ListParameter(Parameter):
     """
@@ -113,6 +139,9 @@ class ListParameter(Parameter):
     def list_values(self) -> list:
         return self.options
 
+    def values(self) -> list:
+        return list(self.options)
+
 
 class CallableGridParameter(Parameter):
     """
@@ -144,6 +173,14 @@ class CallableGridParameter(Parameter):
             values.append(val)
         return values
 
+    def values(self) -> list:
+        values = []
+        value = self.min
+        while value <= self.max:
+            values.append(value)
+            value = self.step(value)
+        return values
+
 
 class AnnealParameter(Parameter):
     """
@@ -176,6 +213,14 @@ class AnnealParameter(Parameter):
             values.append(val)
         return values
 
+    def values(self) -> list:
+        values = []
+        value = self.start
+        while value >= self.threshold:
+            values.append(value)
+            value = self.anneal(value)
+        return values
+
 
 class BinaryParameter(Parameter):
     """
@@ -201,6 +246,9 @@ class BinaryParameter(Parameter):
     def list_values(self) -> list:
         return [True, False]
 
+    def values(self) -> list:
+        return [False, True]
+
 
 class StrategyParameter(Parameter):
     """
@@ -218,9 +266,7 @@ class StrategyParameter(Parameter):
     def __next__(self):
         if self.idx < len(self.options):
             config = self.config.copy()
-            imported_config, _ = Config.load(path=self.options[self.idx])
-            for k, v in imported_config[self.group].items():
-                config[self.group][k] = v
+            self.apply(config, self.options[self.idx])
             self.idx += 1
             return config
         else:
@@ -228,3 +274,12 @@ class StrategyParameter(Parameter):
 
     def list_values(self) -> list:
         return self.options
+
+    def values(self) -> list:
+        return list(self.options)
+
+    def apply(self, config: Config, value):
+        imported_config, _ = Config.load(path=value)
+        group = config.copy_path(self.group)
+        for k, v in imported_config[self.group].items():
+            group[k] = v
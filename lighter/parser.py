@@ -1,6 +1,7 @@
 import os
 import shutil
-from lighter.search import ParameterSearch
+from typing import List
+from lighter.search import SearchSpace
 from lighter.decorator import context
 from lighter.parameter import Parameter
 
@@ -19,13 +20,12 @@ class ConfigParser:
             shutil.rmtree(self.output_path, ignore_errors=False, onerror=None)
         os.makedirs(self.output_path)
 
-    def parse(self, persist: bool = True):
+    def spaces(self) -> List[SearchSpace]:
         """
-        Parses a list of configs which can be used for training different strategies.
-        :param persist: bool value which allows to persist the configs to the file system
-        :return: list of parameters
+        Creates the lazy search spaces of all parameter groups.
+        :return: list of search spaces
         """
-        list_of_configs = []
+        spaces = []
         for group in self.search.keys():
             params = []
             obj = self.search[group]
@@ -34,10 +34,23 @@ class ConfigParser:
                     if issubclass(type(obj[key]), Parameter):
                         param = obj[key]
                         params.append(param)
-            configs = ParameterSearch.compile(params, self.experiment.config)
-            list_of_configs.extend(configs)
-            if persist:
-                for config in configs:
+            spaces.append(SearchSpace(params, self.experiment.config))
+        return spaces
+
+    def parse(self, persist: bool = True, lazy: bool = False):
+        """
+        Parses a list of configs which can be used for training different strategies.
+        :param persist: bool value which allows to persist the configs to the file system
+        :param lazy: returns the search spaces of all groups without materializing or persisting any config
+        :return: list of parameters
+        """
+        if lazy:
+            return self.spaces()
+        list_of_configs = []
+        for space in self.spaces():
+            for config in space:
+                list_of_configs.append(config)
+                if persist:
                     file_name = os.path.join(self.output_path, '{}.json'.format(config.experiment_id))
                     config.save(file_name)
         return list_of_configs
@@ -0,0 +1,143 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from threading import RLock
+
+# enables the profiler at startup, values other than '1' or 'true' are used as chrome trace output file
+PROFILE_ENV = 'LIGHTER_PROFILE'
+
+
+class _Span(object):
+    __slots__ = ('profiler', 'category', 'name', 'start')
+
+    def __init__(self, profiler: "Profiler", category: str, name: str):
+        self.profiler = profiler
+        self.category = category
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add(self.category, self.name, self.start, time.perf_counter() - self.start)
+
+
+class _NoSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Profiler(object):
+    """
+    Startup profiler recording the time spent in type imports, config file loads and type instantiations.
+    It is enabled by the LIGHTER_PROFILE environment variable or by enable() and reports the recorded
+    spans aggregated per category or as Chrome trace (chrome://tracing) json file.
+    """
+    _instance = None
+    # mutex for threadsafe instance creation and recording
+    _mutex = RLock()
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.events = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with Profiler._mutex:
+            self.origin = time.perf_counter()
+            self.events = []
+
+    def record(self, category: str, name: str):
+        """
+        Returns a context manager recording the duration of its block.
+        :param category: category of the span, e.g. 'import', 'config' or 'instantiate'
+        :param name: name of the span
+        :return: context manager
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, category, name)
+
+    def add(self, category: str, name: str, start: float, duration: float):
+        with Profiler._mutex:
+            self.events.append((category, name, start, duration, threading.get_ident()))
+
+    def report(self) -> dict:
+        """
+        Aggregates the recorded spans per category and name, sorted by the total duration.
+        :return: dictionary of categories to lists of (name, count, seconds) tuples
+        """
+        totals = {}
+        with Profiler._mutex:
+            for category, name, _, duration, _ in self.events:
+                count, seconds = totals.setdefault(category, {}).get(name, (0, 0.))
+                totals[category][name] = (count + 1, seconds + duration)
+        report = {}
+        for category, entries in totals.items():
+            report[category] = sorted([(name, count, seconds) for name, (count, seconds) in entries.items()],
+                                      key=lambda entry: entry[2], reverse=True)
+            logging.info('Profiler: {} {:.3f}s in {} calls'.format(category,
+                                                                  sum(entry[2] for entry in report[category]),
+                                                                  sum(entry[1] for entry in report[category])))
+        return report
+
+    def dump(self, file_name: str):
+        """
+        Writes the recorded spans as Chrome trace json file.
+        :param file_name: path of the trace file
+        :return:
+        """
+        with Profiler._mutex:
+            events = [{'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                       'ts': (start - self.origin) * 1e6, 'dur': duration * 1e6}
+                      for category, name, start, duration, tid in self.events]
+        with open(file_name, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+    @staticmethod
+    def get_instance() -> "Profiler":
+        Profiler._mutex.acquire()
+        try:
+            if Profiler._instance is None:
+                value = os.environ.get(PROFILE_ENV, '')
+                Profiler._instance = Profiler(enabled=value.lower() not in ('', '0', 'false'))
+                if value.lower() not in ('', '0', 'false', '1', 'true'):
+                    atexit.register(Profiler._instance.dump, value)
+            return Profiler._instance
+        finally:
+            Profiler._mutex.release()
+
+
+def enable():
+    Profiler.get_instance().enable()
+
+
+def record(category: str, name: str):
+    return Profiler.get_instance().record(category, name)
+
+
+def report() -> dict:
+    return Profiler.get_instance().report()
+
+
+def dump(file_name: str):
+    Profiler.get_instance().dump(file_name)
@@ -1,5 +1,133 @@
+import time
+import threading
 from threading import RLock
 from box import Box
+from lighter.exceptions import TypeInstantiationError
+from lighter.profiler import Profiler
+from lighter import scope
+
+_UNSET = object()
+
+
+def _unwrap(value):
+    return value
+
+
+class LazyInstance(object):
+    """
+    Proxy of a registry instance which is constructed on first access.
+    The construction is thread-safe and happens exactly once, afterwards all attribute accesses and
+    operators are forwarded to the materialized instance.
+    """
+    __slots__ = ('_lazy_name', '_lazy_factory', '_lazy_registry', '_lazy_value', '_lazy_lock', '_lazy_owner')
+
+    def __init__(self, name: str, factory, registry: "Registry" = None):
+        """
+        :param name: registry name of the instance
+        :param factory: callable constructing the instance, usually the registered type
+        :param registry: registry to replace the proxy and record the construction time
+        """
+        object.__setattr__(self, '_lazy_name', name)
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_registry', registry)
+        object.__setattr__(self, '_lazy_value', _UNSET)
+        object.__setattr__(self, '_lazy_lock', RLock())
+        object.__setattr__(self, '_lazy_owner', None)
+
+    @property
+    def _materialized(self) -> bool:
+        return self._lazy_value is not _UNSET
+
+    def _materialize(self):
+        """
+        Returns the instance and constructs it if not already done.
+        """
+        value = self._lazy_value
+        if value is not _UNSET:
+            return value
+        with self._lazy_lock:
+            if self._lazy_value is not _UNSET:
+                return self._lazy_value
+            if self._lazy_owner == threading.get_ident():
+                raise TypeInstantiationError('Cyclic dependency while constructing lazy instance: {}'
+                                             .format(self._lazy_name))
+            object.__setattr__(self, '_lazy_owner', threading.get_ident())
+            try:
+                start = time.perf_counter()
+                with Profiler.get_instance().record('instantiate', self._lazy_name):
+                    value = self._lazy_factory()
+                object.__setattr__(self, '_lazy_value', value)
+            finally:
+                object.__setattr__(self, '_lazy_owner', None)
+            if self._lazy_registry is not None:
+                self._lazy_registry.record_materialization(self._lazy_name, self, value, time.perf_counter() - start)
+            return value
+
+    @property
+    def __class__(self):
+        return self._materialize().__class__
+
+    def __getattr__(self, name):
+        return getattr(self._materialize(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._materialize(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._materialize(), name)
+
+    def __dir__(self):
+        return dir(self._materialize())
+
+    def __repr__(self):
+        if not self._materialized:
+            return '<LazyInstance {}>'.format(self._lazy_name)
+        return repr(self._lazy_value)
+
+    def __str__(self):
+        return str(self._materialize())
+
+    def __bool__(self):
+        return bool(self._materialize())
+
+    def __eq__(self, other):
+        return self._materialize() == other
+
+    def __ne__(self, other):
+        return self._materialize() != other
+
+    def __hash__(self):
+        return hash(self._materialize())
+
+    def __call__(self, *args, **kwargs):
+        return self._materialize()(*args, **kwargs)
+
+    def __len__(self):
+        return len(self._materialize())
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __contains__(self, item):
+        return item in self._materialize()
+
+    def __getitem__(self, key):
+        return self._materialize()[key]
+
+    def __setitem__(self, key, value):
+        self._materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self._materialize()[key]
+
+    def __enter__(self):
+        return self._materialize().__enter__()
+
+    def __exit__(self, *args):
+        return self._materialize().__exit__(*args)
+
+    def __reduce__(self):
+        return _unwrap, (self._materialize(),)
 
 
 class Registry(object):
@@ -19,18 +147,49 @@ class Registry(object):
         super(Registry, self).__init__(**kwargs)
         self.instances = Box()
         self.types = Box()
+        # incremented on every mutation to invalidate cached injection plans
+        self.version = 0
+        # construction time in seconds of all materialized instances
+        self.timings = {}
 
     def register_type(self, name, type_):
         setattr(self.types, name, type_)
+        self.version += 1
 
     def register_instance(self, name, instance):
         setattr(self.instances, name, instance)
+        self.version += 1
+
+    def register_lazy_instance(self, name, factory):
+        """
+        Registers a proxy which constructs the instance on first access.
+        :param name: name of the instance
+        :param factory: callable constructing the instance
+        :return: the lazy instance proxy
+        """
+        instance = LazyInstance(name, factory, registry=self)
+        self.register_instance(name, instance)
+        return instance
+
+    def record_materialization(self, name, proxy, instance, seconds):
+        """
+        Records the construction of an instance and replaces its lazy proxy if still registered.
+        """
+        self.timings[name] = seconds
+        if dict.get(self.instances, name) is proxy:
+            self.register_instance(name, instance)
+
+    def is_materialized(self, name) -> bool:
+        instance = dict.get(self.instances, name)
+        return type(instance) is not LazyInstance or instance._materialized
 
     def unregister_type(self, name):
         del self.types[name]
+        self.version += 1
 
     def unregister_instance(self, name):
         del self.instances[name]
+        self.version += 1
 
     def contains_type(self, name):
         return name in self.types.keys()
@@ -40,17 +199,13 @@ class Registry(object):
 
     @staticmethod
     def get_instance() -> "Registry":
-        Registry._mutex.acquire()
-        try:
-            return Registry._instance
-        finally:
-            Registry._mutex.release()
+        return scope.get_instance(Registry)
 
     @staticmethod
     def create_instance() -> "Registry":
-        Registry._mutex.acquire()
+        mutex = scope.get_mutex(Registry)
+        mutex.acquire()
         try:
-            Registry._instance = Registry()
-            return Registry._instance
+            return scope.set_instance(Registry, Registry())
         finally:
-            Registry._mutex.release()
+            mutex.release()
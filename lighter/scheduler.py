@@ -1,28 +1,133 @@
 import os
 import json
+import hashlib
+import logging
+import traceback
 import torch
-from torch.multiprocessing import Process
+from collections import namedtuple
+from queue import Empty
+from torch.multiprocessing import Process, Queue
 from lighter.context import Context
+from lighter.jobs import JobQueue, DONE, FAILED
 from lighter.loader import Loader
 
+SCHEDULE_FILE = 'schedule.json'
+QUEUE_FILE = 'jobs.sqlite'
+# components reused across the trials of a worker by default, the transform is covered as a dataset dependency
+DEFAULT_REUSE = ['dataset', 'transform']
+
+
+TrialResult = namedtuple('TrialResult', ['trial_id', 'worker', 'status', 'error', 'result'])
+# memory of the cuda context of a process, which is not measured by the caching allocator
+CUDA_CONTEXT_MEMORY = 512 * 2 ** 20
+# execution slot of a worker process with its thread budget and optional cpu cores
+Slot = namedtuple('Slot', ['process_id', 'device', 'threads', 'cores'])
+
+
+class ComponentCache(object):
+    """
+    Keeps the instances of reusable components, e.g. datasets or frozen pretrained backbones, across the
+    trials of a worker. An instance is reused if the fingerprint of its type, config subtrees and
+    dependencies is unchanged. Reused instances are bound to the context, config, registry and instances of
+    the new trial and must not be modified by the trials.
+    """
+    def __init__(self, names=None):
+        """
+        :param names: registry names of the reusable components, or a dictionary mapping the names to the
+               config keys the components depend on, by default a component depends on the key of its name
+        """
+        if not isinstance(names, dict):
+            names = {name: [name] for name in names or []}
+        self.names = names
+        self.instances = {}
+
+    def fingerprint(self, context: Context, name: str, visited: tuple = ()) -> str:
+        """
+        Hashes the type and the config subtrees of a component including the fingerprints of its dependencies.
+        :param context: context of the trial
+        :param name: registry name of the component
+        :param visited: names on the current dependency path
+        :return: hex digest
+        """
+        type_ = context.registry.types.get(name)
+        dependencies = sorted(d for d in Context.dependencies(type_, optional=True)
+                              if d in context.registry.types and d not in visited and d != name)
+        value = {'type': '{}.{}'.format(getattr(type_, '__module__', None), getattr(type_, '__qualname__', type_)),
+                 'config': {key: context.config.get(key) for key in self.names.get(name, [name])},
+                 'dependencies': {d: self.fingerprint(context, d, visited + (name,)) for d in dependencies}}
+        return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+    def instantiate_types(self, context: Context):
+        """
+        Instantiates the types of a context and registers cached instances of unchanged components.
+        :param context: context of the trial
+        :return: list of reused component names
+        """
+        types = dict(context.registry.types)
+        fingerprints = {name: self.fingerprint(context, name) for name in self.names if name in types}
+        reused = []
+        for name, fingerprint in fingerprints.items():
+            cached = self.instances.get(name)
+            if cached is not None and cached[0] == fingerprint:
+                context.registry.register_instance(name, cached[1])
+                del types[name]
+                reused.append(name)
+        context.instantiate_types(types)
+        for name in reused:
+            self.rebind(self.instances[name][1], self.instances[name][2], context)
+        for name, fingerprint in fingerprints.items():
+            self.instances[name] = (fingerprint, context.registry.instances[name], context)
+        return reused
+
+    @staticmethod
+    def rebind(instance, previous: Context, context: Context):
+        """
+        Replaces the attributes of a reused instance which refer to the context, config, registry, search
+        or registry instances of the previous trial by the ones of the new trial.
+        :param instance: reused instance
+        :param previous: context of the trial which created or last reused the instance
+        :param context: context of the new trial
+        """
+        replacements = {id(previous): context,
+                        id(previous.config): context.config,
+                        id(previous.registry): context.registry,
+                        id(previous.search): context.search}
+        for name, value in dict.items(previous.registry.instances):
+            if dict.get(context.registry.instances, name) is not None:
+                replacements.setdefault(id(value), dict.get(context.registry.instances, name))
+        attributes = getattr(instance, '__dict__', {})
+        for key, value in list(attributes.items()):
+            if id(value) in replacements:
+                attributes[key] = replacements[id(value)]
+
 
 class ContextBuilder(object):
     """
     Is used to create a proper context object for running an experiment with the current
+    If a job queue is specified, the config files are pulled from the queue instead of the schedule file
+    and the current job is available as 'job'. Components listed in 'reuse' are shared by consecutive
+    experiments with an unchanged component config, see ComponentCache.
     """
     def __init__(self,
                  process_id: str,
                  schedule_file: str,
                  experiment: str,
-                 device: str = 'cpu'):
+                 device: str = 'cpu',
+                 queue: JobQueue = None,
+                 reuse=DEFAULT_REUSE):
         self.process_id = process_id
+        self.components = ComponentCache(reuse)
         self.schedule_file = schedule_file
         self.device = device
+        self.queue = queue
+        self.job = None
         if 'cuda:' in self.device:
             torch.cuda.set_device(int(self.device.split(':')[-1]))
-        with open(schedule_file) as json_file:
-            schedule = json.load(json_file)
-        self.files = schedule[self.process_id]
+        self.files = []
+        if queue is None and schedule_file is not None:
+            with open(schedule_file) as json_file:
+                schedule = json.load(json_file)
+            self.files = schedule[self.process_id]
         self.experiment = Loader.import_path(experiment)
 
     def __iter__(self):
@@ -34,92 +139,474 @@ class ContextBuilder(object):
         Iterates over the schedules list of config files and prepares the context for execution.
         :return: a prepared experiment
         """
+        if self.queue is not None:
+            return self._next_job()
         if self.idx < len(self.files):
-            # create new context with default config
-            context = Context.create(config_file=self.files[self.idx],
-                                     parse_args_override=True,
-                                     auto_instantiate_types=False,
-                                     allow_context_changes=False)
-
-            # assign a new default device
-            context.config.device.default = self.device
-            # assign the process_id
-            context.config.set_value('process_id', self.process_id)
-
-            # create types
-            context.instantiate_types(context.registry.types)
-
-            # create a new experiment
-            experiment = self.experiment()
-
+            experiment = self.create(self.files[self.idx])
             self.idx += 1
             return experiment
         else:
             raise StopIteration
 
+    def _next_job(self):
+        while True:
+            self.job = self.queue.acquire(self.process_id)
+            if self.job is None:
+                raise StopIteration
+            try:
+                return self.create(self.job.file)
+            except Exception:
+                logging.exception('ContextBuilder: Could not create experiment: {}'.format(self.job.file))
+                self.queue.fail(self.job, traceback.format_exc())
+
+    def create(self, file: str):
+        """
+        Creates the context of a config file and the experiment.
+        :param file: config file
+        :return: a prepared experiment
+        """
+        # create new context with default config
+        context = Context.create(config_file=file,
+                                 parse_args_override=True,
+                                 auto_instantiate_types=False,
+                                 allow_context_changes=False)
+
+        # assign a new default device
+        context.config.device.default = self.device
+        # assign the process_id
+        context.config.set_value('process_id', self.process_id)
+
+        # create types and reuse unchanged components of the previous experiments
+        self.components.instantiate_types(context)
+
+        # create a new experiment
+        return self.experiment()
+
+
+class ResourcePlan(object):
+    """
+    Packs several concurrent trials onto each device from per-trial resource estimates. The number of trials
+    per device is limited by the memory ceiling of the device and by the cores available for the thread
+    budgets of the trials. On cpu the trials are pinned to disjoint core sets to avoid oversubscription.
+    """
+    def __init__(self,
+                 device_name: str = 'cuda',
+                 num_devices: int = 1,
+                 memory: int = None,
+                 threads: int = 1,
+                 memory_limit: int = None,
+                 max_trials: int = None,
+                 cores: list = None,
+                 overhead: int = None):
+        """
+        :param device_name: device type of the trials
+        :param num_devices: number of devices, on cpu the number of core partitions, e.g. one per socket
+        :param memory: estimated peak memory of a trial in bytes excluding the process overhead, if None the
+               scheduler measures a probe trial
+        :param threads: number of threads of a trial
+        :param memory_limit: memory ceiling per device in bytes, defaults to the device or host memory
+        :param max_trials: maximum number of concurrent trials per device
+        :param cores: available cpu cores, defaults to the cpu affinity of the current process
+        :param overhead: memory of a trial process besides the trial in bytes, e.g. the cuda context or the
+               interpreter and torch on cpu, defaults to the baseline measured by the probe or CUDA_CONTEXT_MEMORY
+        """
+        self.device_name = device_name
+        self.num_devices = num_devices
+        self.memory = memory
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self.max_trials = max_trials
+        self.overhead = overhead
+        if cores is None:
+            cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else range(os.cpu_count())
+        self.cores = list(cores)
+
+    def device_memory(self, index: int) -> int:
+        if self.memory_limit is not None:
+            return self.memory_limit
+        if self.device_name == 'cuda':
+            return torch.cuda.get_device_properties(index).total_memory
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // self.num_devices
+
+    def process_memory(self) -> int:
+        """
+        Returns the memory of a trial process including its overhead.
+        """
+        overhead = self.overhead
+        if overhead is None:
+            overhead = CUDA_CONTEXT_MEMORY if self.device_name == 'cuda' else 0
+        return self.memory + overhead
+
+    def trials_per_device(self, index: int = 0) -> int:
+        """
+        Computes the number of concurrent trials of a device.
+        :param index: device index
+        :return: number of trials
+        """
+        trials = len(self.cores) // self.num_devices // self.threads
+        if self.max_trials is not None:
+            trials = min(trials, self.max_trials)
+        if self.memory is not None:
+            trials = min(trials, self.device_memory(index) // self.process_memory())
+        return max(int(trials), 1)
+
+    def slots(self) -> list:
+        """
+        Lists the execution slots of the concurrent trials.
+        :return: list of slots
+        """
+        slots = []
+        cores_per_device = len(self.cores) // self.num_devices
+        for i in range(self.num_devices):
+            device = 'cpu' if self.device_name == 'cpu' else '{}:{}'.format(self.device_name, i)
+            device_cores = self.cores[i * cores_per_device:(i + 1) * cores_per_device]
+            for j in range(self.trials_per_device(i)):
+                cores = None
+                if device == 'cpu':
+                    cores = device_cores[j * self.threads:(j + 1) * self.threads] or device_cores
+                slots.append(Slot('{}:{}.{}'.format(self.device_name, i, j), device, self.threads, cores))
+        return slots
+
+
+class WorkerPool(object):
+    """
+    Long-lived worker processes executing trials submitted as config payloads.
+    The workers keep torch, the imported modules and the device state warm between trials and reuse
+    the components listed in 'reuse' across trials sharing their config subtree.
+    """
+    def __init__(self,
+                 experiment: str,
+                 device_name: str = 'cuda',
+                 num_workers: int = 1,
+                 reuse=DEFAULT_REUSE):
+        """
+        :param experiment: path of the experiment type
+        :param device_name: device type of the workers
+        :param num_workers: number of worker processes, each on its own device index
+        :param reuse: registry names of components to reuse across trials, e.g. ['dataset'], see ComponentCache
+        """
+        self.experiment = experiment
+        self.device_name = device_name
+        self.num_workers = num_workers
+        self.reuse = reuse
+        self.tasks = None
+        self.results = None
+        self.processes = []
+        self.submitted = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        self.tasks = Queue()
+        self.results = Queue()
+        for i in range(self.num_workers):
+            process_id = '{}:{}'.format(self.device_name, i)
+            device = 'cpu' if 'cpu' in process_id else process_id
+            process = Process(name=process_id,
+                              target=WorkerPool.work,
+                              args=(process_id, device, self.experiment, self.reuse, self.tasks, self.results))
+            process.start()
+            self.processes.append(process)
+
+    def submit(self, config: dict, trial_id=None):
+        """
+        Submits a trial to the next idle worker.
+        :param config: config payload of the trial
+        :param trial_id: identifier returned with the result, defaults to a running number
+        :return: trial identifier
+        """
+        if trial_id is None:
+            trial_id = self.submitted
+        self.submitted += 1
+        self.tasks.put((trial_id, json.loads(json.dumps(config))))
+        return trial_id
+
+    def result(self, timeout: float = None) -> TrialResult:
+        return self.results.get(timeout=timeout)
+
+    def map(self, configs: list) -> list:
+        """
+        Executes a list of trials and waits for their results.
+        :param configs: list of config payloads
+        :return: results in the order of the configs
+        """
+        ids = [self.submit(config) for config in configs]
+        results = {}
+        while len(results) < len(ids):
+            result = self.result()
+            results[result.trial_id] = result
+        return [results[trial_id] for trial_id in ids]
+
+    def close(self):
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+
+    @staticmethod
+    def work(process_id: str, device: str, experiment: str, reuse: list, tasks, results):
+        """
+        Main loop of a worker executing trials until it receives None.
+        """
+        if 'cuda:' in device:
+            torch.cuda.set_device(int(device.split(':')[-1]))
+        experiment = Loader.import_path(experiment)
+        components = ComponentCache(reuse)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            trial_id, config = task
+            try:
+                with Context.scope(config_dict=config,
+                                   device=device,
+                                   auto_instantiate_types=False,
+                                   allow_context_changes=False) as context:
+                    context.config.set_value('process_id', process_id)
+                    components.instantiate_types(context)
+                    result = experiment()()
+                results.put(TrialResult(trial_id, process_id, DONE, None, result))
+            except Exception:
+                logging.exception('WorkerPool: Trial failed: {}'.format(trial_id))
+                results.put(TrialResult(trial_id, process_id, FAILED, traceback.format_exc(), None))
+
 
 class Executor:
     """
     Defines the main worker for executing a schedule flow.
     """
     @staticmethod
-    def worker(process_id: str, schedule_file: str, experiment: str, device):
-        scheduler = ContextBuilder(process_id=process_id,
-                                   schedule_file=schedule_file,
-                                   experiment=experiment,
-                                   device=device)
-        for i, exp in enumerate(scheduler):
-            exp()
+    def worker(process_id: str, schedule_file: str, experiment: str, device, queue: JobQueue = None,
+               reuse=DEFAULT_REUSE, slot: Slot = None, limit: int = None, results=None):
+        """
+        Executes the scheduled experiments of a worker.
+        :param slot: execution slot assigning the thread budget and cpu cores of the worker
+        :param limit: maximum number of experiments to execute
+        :param results: queue receiving the peak memory of the trials and the baseline memory of the worker
+        """
+        baseline = Executor.baseline_memory(device)
+        try:
+            if slot is not None:
+                Executor.assign(slot)
+            scheduler = ContextBuilder(process_id=process_id,
+                                       schedule_file=schedule_file,
+                                       experiment=experiment,
+                                       device=device,
+                                       queue=queue,
+                                       reuse=reuse)
+            for i, exp in enumerate(scheduler):
+                if queue is None:
+                    exp()
+                else:
+                    # mark the job status and continue with the next job if the experiment fails
+                    try:
+                        exp()
+                    except Exception:
+                        logging.exception('Executor: Experiment failed: {}'.format(scheduler.job.file))
+                        queue.fail(scheduler.job, traceback.format_exc())
+                    else:
+                        queue.complete(scheduler.job)
+                if limit is not None and i + 1 >= limit:
+                    break
+        finally:
+            if results is not None:
+                peak = Executor.peak_memory(device)
+                results.put((peak if baseline is None else max(peak - baseline, 0), baseline))
+
+    @staticmethod
+    def assign(slot: Slot):
+        """
+        Restricts the current process to the thread budget and cpu cores of a slot.
+        :param slot: execution slot
+        :return:
+        """
+        if slot.threads is not None:
+            torch.set_num_threads(slot.threads)
+        if slot.cores is not None and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, slot.cores)
+
+    @staticmethod
+    def baseline_memory(device: str) -> int:
+        """
+        Returns the memory of the current process before it executes trials in bytes, or None on cuda
+        where the memory of the cuda context is not measured by the caching allocator.
+        :param device: device of the process
+        :return: baseline memory
+        """
+        if 'cuda' in device:
+            return None
+        return Executor.peak_memory(device)
+
+    @staticmethod
+    def peak_memory(device: str) -> int:
+        """
+        Returns the peak memory of the current process on a device in bytes. On cuda the memory reserved by
+        the caching allocator is measured, which excludes the memory of the cuda context.
+        :param device: device of the process
+        :return: peak memory
+        """
+        if 'cuda' in device:
+            return torch.cuda.max_memory_reserved(device)
+        import resource
+        # maximum resident set size, which is reported in kilobytes on linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
 
 
 class Scheduler:
     """
     Schedules a list of parameters within a designated path for execution on multiple devices.
+    With dynamic scheduling the configs are added to a shared job queue and idle workers pull the next job,
+    otherwise the configs are assigned round-robin to the workers. With a resource plan several workers
+    share a device, if the plan declares no trial memory the first trial is executed alone to measure it.
     """
     def __init__(self,
                  path: str,
                  experiment: str,
                  device_name: str = 'cuda',
-                 num_workers: int = 1):
+                 num_workers: int = 1,
+                 dynamic: bool = False,
+                 max_retries: int = 0,
+                 pool: WorkerPool = None,
+                 reuse=DEFAULT_REUSE,
+                 resources: ResourcePlan = None):
+        """
+        :param dynamic: pulls the configs from a shared job queue instead of a static schedule
+        :param max_retries: number of retries of failed jobs with dynamic scheduling
+        :param pool: started worker pool executing the configs instead of new processes per run
+        :param reuse: components reused by the trials of a worker, see ComponentCache
+        :param resources: plan packing several concurrent trials per device instead of one worker per device
+        """
         self.path = path
         self.experiment = experiment
         self.device_name = device_name
         self.num_workers = num_workers
+        self.dynamic = dynamic
+        self.max_retries = max_retries
+        self.pool = pool
+        self.reuse = reuse
+        self.resources = resources
         self.schedule_file = None
+        self.queue = None
         self.processes = []
 
-    def build_schedule(self):
+    def config_files(self) -> list:
+        """
+        Lists the config files within the defined path.
+        :return: list of paths
+        """
+        return [os.path.join(self.path, file) for file in sorted(os.listdir(self.path))
+                if file.endswith('.json') and file != SCHEDULE_FILE]
+
+    def slots(self) -> list:
+        """
+        Lists the execution slots of the workers, which is one per device without a resource plan.
+        :return: list of slots
+        """
+        if self.resources is not None:
+            return self.resources.slots()
+        slots = []
+        for i in range(self.num_workers):
+            process_id = '{}:{}'.format(self.device_name, i)
+            slots.append(Slot(process_id, 'cpu' if 'cpu' in process_id else process_id, None, None))
+        return slots
+
+    def build_schedule(self, files: list = None, slots: list = None):
         """
         Builds a schedule file from the defined path with configs.
+        :param files: config files to schedule, defaults to all configs of the path
+        :param slots: execution slots, defaults to the slots of the scheduler
         :return:
         """
+        if files is None:
+            files = self.config_files()
+        if slots is None:
+            slots = self.slots()
         # create empty schedule
-        schedule = {'{}:{}'.format(self.device_name, i % self.num_workers): [] for i in range(self.num_workers)}
+        schedule = {slot.process_id: [] for slot in slots}
         # assign configs to schedule
-        for i, file in enumerate(os.listdir(self.path)):
-            schedule['{}:{}'.format(self.device_name, i % self.num_workers)].append(
-                os.path.join(self.path, file))
+        for i, file in enumerate(files):
+            schedule[slots[i % len(slots)].process_id].append(file)
         # save schedule
-        self.schedule_file = os.path.join(self.path, 'schedule.json')
+        self.schedule_file = os.path.join(self.path, SCHEDULE_FILE)
         dict_str = json.dumps(schedule, indent=2)
         with open(self.schedule_file, 'w') as file:
             file.write(dict_str)
 
+    def build_queue(self):
+        """
+        Adds the configs from the defined path to the job queue. Jobs of an interrupted previous run
+        are continued.
+        :return:
+        """
+        self.queue = JobQueue(os.path.join(self.path, QUEUE_FILE), max_retries=self.max_retries)
+        self.queue.requeue_running()
+        self.queue.add(self.config_files())
+
+    def progress(self) -> dict:
+        """
+        Returns the progress of a dynamic schedule.
+        :return: number of jobs per status and the running jobs per worker
+        """
+        return self.queue.progress()
+
     def create_processes(self):
         """
         Creates a list of processes with execution workers.
         :return:
         """
-        for i in range(self.num_workers):
-            process_id = '{}:{}'.format(self.device_name, i)
-            device = process_id
-            if 'cpu' in device:
-                device = 'cpu'
-            process = Process(name=process_id,
+        for slot in self.slots():
+            process = Process(name=slot.process_id,
                               target=Executor.worker,
-                              args=(process_id, self.schedule_file, self.experiment, device))
+                              args=(slot.process_id, self.schedule_file, self.experiment, slot.device, self.queue,
+                                    self.reuse, slot))
             self.processes.append(process)
 
+    def probe(self) -> list:
+        """
+        Executes the first trial alone on the first slot and assigns its peak memory and the baseline memory of
+        its process to the resource plan.
+        :return: remaining config files of a static schedule
+        """
+        slot = self.resources.slots()[0]
+        files = self.config_files()
+        if not self.dynamic:
+            self.build_schedule(files[:1], slots=[slot])
+            files = files[1:]
+        results = Queue()
+        process = Process(name=slot.process_id,
+                          target=Executor.worker,
+                          args=(slot.process_id, self.schedule_file, self.experiment, slot.device, self.queue,
+                                self.reuse, slot, 1, results))
+        process.start()
+        self.resources.memory, overhead = self._probe_result(process, results)
+        process.join()
+        if self.resources.overhead is None:
+            self.resources.overhead = overhead
+        logging.info('Scheduler: Probe trial peak memory: {:.1f} MB, process memory: {:.1f} MB, '
+                     '{} trials per device'.format(self.resources.memory / 2 ** 20,
+                                                   self.resources.process_memory() / 2 ** 20,
+                                                   self.resources.trials_per_device()))
+        return files
+
+    @staticmethod
+    def _probe_result(process: Process, results: Queue, interval: float = 1.) -> tuple:
+        # poll the result, since a probe killed by the system or a crash of the device never reports it
+        while True:
+            alive = process.is_alive()
+            try:
+                return results.get(timeout=interval)
+            except Empty:
+                if not alive:
+                    process.join()
+                    raise RuntimeError('Scheduler: Probe trial exited with code {} without reporting its peak '
+                                       'memory'.format(process.exitcode))
+
     def execute_processes(self):
         """
         Executes a schedule on the initiated process workers.
@@ -139,9 +626,28 @@ class Scheduler:
     def run(self):
         """
         Main execution loop for starting a scheduled run.
-        :return:
+        :return: trial results if executed on a worker pool
         """
-        self.build_schedule()
+        if self.pool is not None:
+            return self.run_pool()
+        files = None
+        if self.dynamic:
+            self.build_queue()
+        if self.resources is not None and self.resources.memory is None:
+            files = self.probe()
+        if not self.dynamic:
+            self.build_schedule(files)
         self.create_processes()
         self.execute_processes()
         self.clean_processes()
+
+    def run_pool(self) -> list:
+        """
+        Executes the configs from the defined path on the warm worker pool.
+        :return: list of trial results
+        """
+        configs = []
+        for file in self.config_files():
+            with open(file) as json_file:
+                configs.append(json.load(json_file))
+        return self.pool.map(configs)
@@ -0,0 +1,64 @@
+import contextvars
+from threading import RLock
+
+# instances of the singleton classes of the active scope, None selects the process-wide instances
+_scope = contextvars.ContextVar('lighter_scope', default=None)
+
+
+def get_instance(class_):
+    """
+    Returns the instance of a singleton class within the active scope of the current thread or task.
+    Reads are lock-free, if no scope is active the process-wide instance is returned.
+    :param class_: singleton class, e.g. Context, Config, Registry or ParameterSearch
+    :return: instance or None if not created
+    """
+    scope = _scope.get()
+    if scope is None:
+        return class_._instance
+    return scope.get(class_)
+
+
+def set_instance(class_, instance):
+    """
+    Sets the instance of a singleton class within the active scope, or the process-wide instance
+    if no scope is active. Callers hold the creation lock of the class.
+    :param class_: singleton class
+    :param instance: new instance
+    :return: the instance
+    """
+    scope = _scope.get()
+    if scope is None:
+        class_._instance = instance
+    else:
+        scope[class_] = instance
+    return instance
+
+
+def get_mutex(class_):
+    """
+    Returns the creation lock of a singleton class, which is separate for each scope such that
+    independent scopes do not block each other.
+    :param class_: singleton class
+    :return: reentrant lock
+    """
+    scope = _scope.get()
+    if scope is None:
+        return class_._mutex
+    return scope.setdefault((class_, 'mutex'), RLock())
+
+
+def push():
+    """
+    Activates a new empty scope for the current thread or task. Threads started afterwards only see the
+    scope if they run within a copy of the current context, see contextvars.copy_context.
+    :return: token to restore the previous scope with pop
+    """
+    return _scope.set({})
+
+
+def pop(token):
+    _scope.reset(token)
+
+
+def active() -> bool:
+    return _scope.get() is not None
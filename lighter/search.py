@@ -1,9 +1,81 @@
-from typing import List
+import random
+from typing import List, Iterator
 from box import Box
 from lighter.config import Config
 from threading import RLock
 from lighter.misc import generate_long_id
 from lighter.parameter import Parameter
+from lighter import scope
+
+
+class SearchSpace(object):
+    """
+    Lazy cartesian product of search parameters. Every parameter is an index axis and each permutation is
+    addressed by its mixed-radix index, where the last parameter changes fastest like the nested iteration.
+    Configs are only materialized when a permutation is accessed.
+    """
+    def __init__(self, params: List[Parameter], config: Config = None):
+        """
+        :param params: parameters spanning the search space
+        :param config: base config of all permutations, defaults to the config of the first parameter
+        """
+        if config is None and len(params) > 0:
+            config = params[0].config
+        self.params = params
+        self.config = config
+        self.axes = [param.values() for param in params]
+        self.sizes = [len(axis) for axis in self.axes]
+        self.size = 1
+        for size in self.sizes:
+            self.size *= size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self) -> Iterator[Config]:
+        for index in range(self.size):
+            yield self[index]
+
+    def __getitem__(self, index: int) -> Config:
+        config = self.config.copy()
+        for param, value in zip(self.params, self.values(index)):
+            param.apply(config, value)
+        config['experiment_id'] = generate_long_id()
+        return config
+
+    def indices(self, index: int) -> tuple:
+        """
+        Returns the value index of each parameter for a permutation.
+        :param index: index of the permutation
+        :return: tuple of value indices
+        """
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('SearchSpace: index {} out of range for size {}'.format(index, self.size))
+        indices = []
+        for size in reversed(self.sizes):
+            index, digit = divmod(index, size)
+            indices.append(digit)
+        return tuple(reversed(indices))
+
+    def values(self, index: int) -> list:
+        """
+        Returns the parameter values of a permutation.
+        :param index: index of the permutation
+        :return: list of values in parameter order
+        """
+        return [axis[i] for axis, i in zip(self.axes, self.indices(index))]
+
+    def sample(self, k: int, seed: int = None) -> Iterator[Config]:
+        """
+        Lazily samples k distinct permutations without replacement.
+        :param k: number of permutations
+        :param seed: random seed
+        :return: generator of configs
+        """
+        for index in random.Random(seed).sample(range(self.size), k):
+            yield self[index]
 
 
 class ParameterSearch(Box):
@@ -18,31 +90,21 @@ class ParameterSearch(Box):
 
     @staticmethod
     def compile(params: List["Parameter"], config: Config = None) -> List[Config]:
-        configs = []
         if len(params) <= 0:
             # fix to get unique name
             config['experiment_id'] = generate_long_id()
             return [config]
-        param = params[0]
-        if config is not None:
-            param.update_config(config)
-        for p in param:
-            configs = configs + ParameterSearch.compile(params[1:], p)
-        return configs
+        return list(SearchSpace(params, config))
 
     @staticmethod
     def get_instance() -> "ParameterSearch":
-        ParameterSearch._mutex.acquire()
-        try:
-            return ParameterSearch._instance
-        finally:
-            ParameterSearch._mutex.release()
+        return scope.get_instance(ParameterSearch)
 
     @staticmethod
     def create_instance() -> "ParameterSearch":
-        ParameterSearch._mutex.acquire()
+        mutex = scope.get_mutex(ParameterSearch)
+        mutex.acquire()
         try:
-            ParameterSearch._instance = ParameterSearch()
-            return ParameterSearch._instance
+            return scope.set_instance(ParameterSearch, ParameterSearch())
         finally:
-            ParameterSearch._mutex.release()
+            mutex.release()
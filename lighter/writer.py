@@ -1,4 +1,7 @@
 import socket
+import logging
+from queue import Queue, Full
+from threading import Thread
 from datetime import datetime
 from torch.utils.tensorboard import SummaryWriter
 from lighter.decorator import context
@@ -18,18 +21,107 @@ class BaseWriter(SummaryWriter):
                                          purge_step=purge_step, max_queue=max_queue,
                                          flush_secs=flush_secs, filename_suffix=filename_suffix)
         self.steps = 0
+        self.tags = {}
+
+    def tag(self, key: str, category: str = None):
+        """
+        Returns the tensorboard tag of a collectible key. The mapping is computed once per key.
+        :param key: collectible key
+        :param category: category filter of the write call
+        :return: tag name or None if the key does not belong to the category
+        """
+        try:
+            return self.tags[(key, category)]
+        except KeyError:
+            pass
+        # remove collectible key prefix if available
+        val = key.split('$_')
+        cat, name = (val[0], val[1]) if len(val) > 1 else (None, val[0])
+        tag = name
+        if category is not None and cat != "${}".format(category):
+            tag = None
+        # prepend category if available
+        elif category is not None:
+            tag = '{}/{}'.format(category, name)
+        self.tags[(key, category)] = tag
+        return tag
 
     def write(self, category: str = None, *args, **kwargs):
         for key, value in kwargs.items():
-            # remove collectible key prefix if available
-            val = key.split('$_')
-            cat, key = val[0], val[1]
-            if category is not None and cat != "${}".format(category):
-                continue
-            # prepend category if available
-            if category is not None:
-                key = '{}/{}'.format(category, key)
-            self.add_scalar(key, value, self.steps)
+            tag = self.tag(key, category)
+            if tag is not None:
+                self.add_scalar(tag, value, self.steps)
 
     def step(self):
         self.steps += 1
+
+
+class AsyncWriter(BaseWriter):
+    """
+    Writer queueing the scalars of each write call as one batch for a background thread.
+    Write calls never block; if the queue is full the batch is dropped and counted. Writes after close are ignored.
+    """
+    @context
+    def __init__(self, log_dir=None, comment='', purge_step=None, max_queue=10,
+                 flush_secs=120, filename_suffix='', max_pending: int = 1024):
+        super(AsyncWriter, self).__init__(log_dir=log_dir, comment=comment,
+                                          purge_step=purge_step, max_queue=max_queue,
+                                          flush_secs=flush_secs, filename_suffix=filename_suffix)
+        self.pending = Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self.closed = False
+        self.thread = Thread(target=self._worker, name='lighter-writer', daemon=True)
+        self.thread.start()
+
+    def _worker(self):
+        while True:
+            batch = self.pending.get()
+            try:
+                if batch is None:
+                    return
+                scalars, step = batch
+                for tag, value in scalars:
+                    self.add_scalar(tag, value, step)
+                self.written += len(scalars)
+            except Exception as e:
+                logging.warning('AsyncWriter: Could not write scalars - {}'.format(e))
+            finally:
+                self.pending.task_done()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of batches waiting to be written.
+        """
+        return self.pending.qsize()
+
+    def write(self, category: str = None, *args, **kwargs):
+        if self.closed:
+            return
+        scalars = []
+        for key, value in kwargs.items():
+            tag = self.tag(key, category)
+            if tag is not None:
+                scalars.append((tag, value))
+        if len(scalars) == 0:
+            return
+        try:
+            self.pending.put_nowait((scalars, self.steps))
+        except Full:
+            self.dropped += 1
+
+    def flush(self):
+        """
+        Waits until all queued batches are written and flushes the event file.
+        :return:
+        """
+        self.pending.join()
+        super(AsyncWriter, self).flush()
+
+    def close(self):
+        self.closed = True
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+        super(AsyncWriter, self).close()